@@ -1,16 +1,56 @@
-from fastapi import APIRouter, HTTPException, Response, Depends
+from email.utils import formatdate, parsedate_to_datetime
+from pathlib import Path
+from typing import List
+
+from fastapi import APIRouter, HTTPException, Response, Depends, Query
+from fastapi.responses import FileResponse
 from slowapi import Limiter
 from slowapi.util import get_remote_address
 from starlette.requests import Request
 from loguru import logger
 
-from app.config.settings import osu_api
+from app.network.osu_api import osu_api
 from app.security.api_key import get_api_key
-from app.osu_utils.beatmap import get_map_bg, get_osu_file_path, get_bg_filename, get_info_img
+from app.osu_utils.beatmap import (get_map_bg_path, get_osu_file_path, get_bg_filename, get_info_img, get_info_img_batch,
+                                   get_cover_batch)
 
 beatmap_router = APIRouter(tags=["Beatmap & BeatmapSet"])
 limiter = Limiter(key_func=get_remote_address)
 
+# 背景图随谱面更新而变化, 客户端缓存一天, 过期后通过 ETag 重新验证
+_COVER_CACHE_CONTROL = "public, max-age=86400"
+
+
+def _not_modified(request: Request, etag: str, last_modified: float) -> bool:
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match is not None:
+        tags = [tag.strip().removeprefix("W/") for tag in if_none_match.split(",")]
+        return "*" in tags or etag in tags
+    if_modified_since = request.headers.get("if-modified-since")
+    if if_modified_since is not None:
+        try:
+            return int(last_modified) <= parsedate_to_datetime(if_modified_since).timestamp()
+        except (TypeError, ValueError):
+            return False
+    return False
+
+
+def _cover_response(request: Request, path: Path, bg_name: str) -> Response:
+    """
+    以文件形式返回缓存中的背景图, 支持 Range 与条件请求
+
+    :param path: 磁盘缓存中的文件, 文件名即内容的 sha256, 直接作为 ETag
+    :param bg_name: 背景图文件名, 用于判断图片类型
+    """
+    etag = f'"{path.name}"'
+    last_modified = path.stat().st_mtime
+    headers = {"ETag": etag, "Cache-Control": _COVER_CACHE_CONTROL}
+    if _not_modified(request, etag, last_modified):
+        headers["Last-Modified"] = formatdate(last_modified, usegmt=True)
+        return Response(status_code=304, headers=headers)
+    media_type = "image/png" if bg_name.lower().endswith(".png") else "image/jpeg"
+    return FileResponse(path, media_type=media_type, headers=headers)
+
 
 @beatmap_router.get("/beatmap/cover", responses={
     200: {"description": "OK", "content": {"image/png": {}}},
@@ -24,9 +64,9 @@ async def get_beatmap_cover(request: Request, beatmap_id: int = None, beatmapset
         if not beatmap_id and not beatmapset_id:
             raise HTTPException(status_code=400, detail="Bad request")
         if beatmap_id:
-            beatmap_set_info = osu_api.beatmapset(beatmap_id=beatmap_id)
+            beatmap_set_info = await osu_api.beatmapset(beatmap_id=beatmap_id)
         else:
-            beatmap_set_info = osu_api.beatmapset(beatmapset_id=beatmapset_id)
+            beatmap_set_info = await osu_api.beatmapset(beatmapset_id=beatmapset_id)
 
         if not beatmap_id:
             beatmap_id = beatmap_set_info.beatmaps[0].id
@@ -37,13 +77,13 @@ async def get_beatmap_cover(request: Request, beatmap_id: int = None, beatmapset
         )
         bg_name = get_bg_filename(osu_file_path)
 
+        path = await get_map_bg_path(map_id=beatmap_id, set_id=beatmap_set_info.id, bg_name=bg_name)
+
     except Exception as e:
         logger.error(f"Internal server error: {e}")
         raise HTTPException(status_code=500, detail=f"Internal server error: {e}")
 
-    content = await get_map_bg(map_id=beatmap_set_info.beatmaps[0].id, set_id=beatmap_set_info.id, bg_name=bg_name)
-
-    return Response(content=content, media_type="image/jpeg")
+    return _cover_response(request, path, bg_name)
 
 
 @beatmap_router.get("/beatmap/info", responses={
@@ -59,3 +99,32 @@ async def get_beatmap_info(request: Request, beatmap_id: int = None, beatmapset_
     获取 beatmap 信息图片, 传入 beatmap_id 或 beatmapset_id
     """
     return await get_info_img(beatmap_id, beatmapset_id, theme)
+
+
+@beatmap_router.get("/beatmap/cover/batch", responses={
+    200: {"description": "OK", "content": {"application/zip": {}}},
+    404: {"description": "No beatmap found"},
+    403: {"description": "Access Token required or invalid"},
+    422: {"description": "Validation error"}
+}, dependencies=[Depends(get_api_key)])
+@limiter.limit("5/minute")
+async def get_beatmap_cover_batch(request: Request, beatmap_ids: List[int] = Query(..., max_length=50)):
+    """
+    批量获取 beatmap 背景图, 以 zip 压缩包返回
+    """
+    return await get_cover_batch(beatmap_ids)
+
+
+@beatmap_router.get("/beatmap/info/batch", responses={
+    200: {"description": "OK", "content": {"application/zip": {}}},
+    404: {"description": "No beatmap found"},
+    403: {"description": "Access Token required or invalid"},
+    422: {"description": "Validation error"}
+}, dependencies=[Depends(get_api_key)])
+@limiter.limit("5/minute")
+async def get_beatmap_info_batch(request: Request, beatmap_ids: List[int] = Query(..., max_length=50),
+                                 theme: str = "default"):
+    """
+    批量获取 beatmap 信息图片, 以 zip 压缩包返回
+    """
+    return await get_info_img_batch(beatmap_ids, theme)
@@ -7,7 +7,21 @@ from slowapi.util import get_remote_address
 from starlette.requests import Request
 
 from app.security.api_key import get_api_key
-from app.osu_utils.file import cache_dir, log_dir
+from app.database.api_cache import get_api_cache_stats
+from app.database.cache import get_redis_stats
+from app.database.disk_cache import disk_cache
+from app.database.image_cache import image_cache, derived_image_cache
+from app.draw.asset_store import asset_store
+from app.network.download import download_manager
+from app.network.mirror import mirror_client
+from app.network.network import get_http_pool_stats
+from app.network.public_token import public_token
+from app.osu_utils.file import cache_dir, log_dir, run_file_io
+from app.osu_utils.osu_file import get_osu_file_info_stats
+from app.osu_utils.pp import clear_pp_cache, get_pp_cache_stats
+from app.draw.render import render_pool
+from app.osu_utils.pp_pool import pp_pool
+from app.osu_utils.prefetch import prefetcher
 from app.osu_utils.user import get_all_bound_users
 from app.osu_utils.user_info import save_user_info
 from loguru import logger
@@ -46,6 +60,11 @@ async def clear_cache(request: Request):
                     if not any(user_dir.iterdir()):
                         user_dir.rmdir()
 
+        await run_file_io(disk_cache.clear)
+        image_cache.clear()
+        derived_image_cache.clear()
+        clear_pp_cache()
+
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -86,3 +105,43 @@ async def update_user_info(request: Request):
         raise HTTPException(status_code=500, detail=str(e))
 
     return {"message": "User info updated"}
+
+
+@task_router.post("/task/prefetch", responses={
+    200: {"description": "OK"},
+    403: {"description": "Access Token required or invalid"},
+}, dependencies=[Depends(get_api_key)])
+async def prefetch(request: Request):
+    """
+    在后台预热所有绑定用户的最近与最好成绩相关的缓存
+    """
+    if not prefetcher.trigger():
+        return {"message": "Prefetch is already running"}
+    return {"message": "Prefetch started"}
+
+
+@task_router.get("/task/stats", responses={
+    200: {"description": "OK"},
+    403: {"description": "Access Token required or invalid"},
+}, dependencies=[Depends(get_api_key)])
+async def get_stats(request: Request):
+    """
+    获取运行状态统计, 用于监控
+    """
+    return {
+        "http_pools": get_http_pool_stats(),
+        "osu_api_cache": get_api_cache_stats(),
+        "redis": get_redis_stats(),
+        "public_token": public_token.stats(),
+        "pp_cache": get_pp_cache_stats(),
+        "osu_file_info": get_osu_file_info_stats(),
+        "pp_pool": pp_pool.stats(),
+        "render_pool": render_pool.stats(),
+        "disk_cache": disk_cache.stats(),
+        "downloads": download_manager.stats(),
+        "mirrors": mirror_client.stats(),
+        "image_cache": image_cache.stats(),
+        "derived_image_cache": derived_image_cache.stats(),
+        "assets": asset_store.stats(),
+        "prefetch": prefetcher.stats(),
+    }
@@ -1,6 +1,7 @@
 import json
+from typing import List
 
-from fastapi import APIRouter, Depends, File, UploadFile, Form
+from fastapi import APIRouter, Depends, File, UploadFile, Form, Query
 from slowapi import Limiter
 from slowapi.util import get_remote_address
 from starlette.requests import Request
@@ -46,8 +47,13 @@ async def update_background(request: Request, data: str = Form(...), background_
     404: {"description": "User not found"},
     500: {"description": "Internal server error"}
 }, dependencies=[Depends(get_api_key)])
-async def get_performance_control_result(request: Request, platform: str, platform_uid: str, pp: float):
-    return await generate_player_pp_control_result(platform, platform_uid, pp)
+async def get_performance_control_result(request: Request, platform: str, platform_uid: str,
+                                         pp: float = Query(..., ge=0),
+                                         targets: List[float] = Query(None, max_length=1000)):
+    """
+    计算达到目标 pp 增量所需的新成绩 pp, 传入 targets 时额外返回每个目标增量的结果
+    """
+    return await generate_player_pp_control_result(platform, platform_uid, pp, targets)
 
 
 @info_router.get("/user_info/extra/performance_analyze", responses={
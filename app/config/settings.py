@@ -26,4 +26,66 @@ else:
     REDIS_PORT = os.environ.get('REDIS_PORT')
     REDIS_DB = os.environ.get('REDIS_DB')
 
+# 出站 HTTP 连接池配置, 每个 host 单独维护一个连接池
+HTTP_MAX_CONNECTIONS = int(os.environ.get('HTTP_MAX_CONNECTIONS', 20))
+HTTP_MAX_KEEPALIVE_CONNECTIONS = int(os.environ.get('HTTP_MAX_KEEPALIVE_CONNECTIONS', 10))
+HTTP_KEEPALIVE_EXPIRY = float(os.environ.get('HTTP_KEEPALIVE_EXPIRY', 30))
+HTTP2_ENABLED = os.environ.get('HTTP2_ENABLED', 'true').lower() == 'true'
+
+# osu! API 调用线程池大小
+OSU_API_MAX_WORKERS = int(os.environ.get('OSU_API_MAX_WORKERS', 8))
+
+# Redis 连接池
+REDIS_MAX_CONNECTIONS = int(os.environ.get('REDIS_MAX_CONNECTIONS', 50))
+REDIS_HEALTH_CHECK_INTERVAL = int(os.environ.get('REDIS_HEALTH_CHECK_INTERVAL', 30))
+# Redis 不可用时改用进程内缓存, 每隔 REDIS_RETRY_INTERVAL 秒重试一次
+REDIS_RETRY_INTERVAL = float(os.environ.get('REDIS_RETRY_INTERVAL', 5))
+LOCAL_CACHE_MAX_ITEMS = int(os.environ.get('LOCAL_CACHE_MAX_ITEMS', 1024))
+
+# public token 在过期前多少秒主动续期
+PUBLIC_TOKEN_RENEW_MARGIN = int(os.environ.get('PUBLIC_TOKEN_RENEW_MARGIN', 300))
+
+# 是否将 osu! API 响应缓存到 Redis
+OSU_API_CACHE_ENABLED = os.environ.get('OSU_API_CACHE_ENABLED', 'true').lower() == 'true'
+
+# pp 计算缓存大小（字节）, 启用 pp 进程池时每个子进程各有一份
+PP_BEATMAP_CACHE_MAX_BYTES = int(os.environ.get('PP_BEATMAP_CACHE_MAX_BYTES', 128 * 1024 * 1024))
+PP_DIFFICULTY_CACHE_MAX_BYTES = int(os.environ.get('PP_DIFFICULTY_CACHE_MAX_BYTES', 16 * 1024 * 1024))
+
+# pp 计算进程池大小, 为 0 时在事件循环中直接计算; 排队任务超过 PP_QUEUE_SIZE 时返回 503
+PP_WORKERS = int(os.environ.get('PP_WORKERS', min(4, os.cpu_count() or 1)))
+PP_QUEUE_SIZE = int(os.environ.get('PP_QUEUE_SIZE', 32))
+
+# 谱面文件与背景图磁盘缓存大小（字节）
+DISK_CACHE_MAX_BYTES = int(os.environ.get('DISK_CACHE_MAX_BYTES', 2 * 1024 * 1024 * 1024))
+
+# 文件读写线程池大小; 大于 FILE_MMAP_THRESHOLD 字节的文件通过内存映射读取, 为 0 时不使用
+FILE_IO_MAX_WORKERS = int(os.environ.get('FILE_IO_MAX_WORKERS', 8))
+FILE_MMAP_THRESHOLD = int(os.environ.get('FILE_MMAP_THRESHOLD', 0))
+# 解码后的背景图、头像等图片的内存缓存大小（字节）, 按 RGBA 像素计算
+IMAGE_CACHE_MAX_BYTES = int(os.environ.get('IMAGE_CACHE_MAX_BYTES', 256 * 1024 * 1024))
+# 预处理后背景图的内存缓存大小（字节）, 同时会以 PNG 写入磁盘缓存
+DERIVED_IMAGE_CACHE_MAX_BYTES = int(os.environ.get('DERIVED_IMAGE_CACHE_MAX_BYTES', 128 * 1024 * 1024))
+# 缓存预热: 并发数、每秒最多调用 osu! API 的次数、每个用户预热的最好成绩数量;
+# PREFETCH_INTERVAL 为定时预热的间隔秒数, 为 0 时只能通过 /task/prefetch 手动触发
+PREFETCH_CONCURRENCY = int(os.environ.get('PREFETCH_CONCURRENCY', 4))
+PREFETCH_API_RATE = float(os.environ.get('PREFETCH_API_RATE', 0.5))
+PREFETCH_BEST_LIMIT = int(os.environ.get('PREFETCH_BEST_LIMIT', 10))
+PREFETCH_INTERVAL = int(os.environ.get('PREFETCH_INTERVAL', 0))
+# 多镜像下载: 最优镜像超过 MIRROR_HEDGE_DELAY 秒未返回时请求下一个镜像; 单次请求超时秒数; 整轮失败后的最大重试次数
+MIRROR_HEDGE_DELAY = float(os.environ.get('MIRROR_HEDGE_DELAY', 0.5))
+MIRROR_TIMEOUT = float(os.environ.get('MIRROR_TIMEOUT', 10))
+MIRROR_MAX_ATTEMPTS = int(os.environ.get('MIRROR_MAX_ATTEMPTS', 3))
+# 主题绘图进程池大小, 为 0 时在事件循环中直接绘制; 排队任务超过 RENDER_QUEUE_SIZE 时返回 503,
+# 单次绘制超过 RENDER_TIMEOUT 秒时返回 504; 每个子进程会重新导入配置并持有独立的客户端与缓存, 默认关闭
+RENDER_WORKERS = int(os.environ.get('RENDER_WORKERS', 0))
+RENDER_QUEUE_SIZE = int(os.environ.get('RENDER_QUEUE_SIZE', 16))
+RENDER_TIMEOUT = float(os.environ.get('RENDER_TIMEOUT', 30))
+# 主题文件修改后自动重新加载, 仅用于主题开发
+THEME_HOT_RELOAD = os.environ.get('THEME_HOT_RELOAD', 'false').lower() == 'true'
+# 主题静态素材（layout、mod、rank、国旗等）解码后的内存缓存大小（字节）
+ASSET_CACHE_MAX_BYTES = int(os.environ.get('ASSET_CACHE_MAX_BYTES', 128 * 1024 * 1024))
+# 启动时预先解码所有主题素材
+ASSET_PRELOAD = os.environ.get('ASSET_PRELOAD', 'true').lower() == 'true'
+
 osu_api = Ossapi(CLIENT_ID, CLIENT_SECRET)
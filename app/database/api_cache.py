@@ -0,0 +1,186 @@
+import asyncio
+import functools
+import hashlib
+import io
+import pickle
+import uuid
+from collections import defaultdict
+from typing import Any, Awaitable, Callable, Dict
+
+from ossapi.utils import Model
+
+from app.config import settings
+from app.config.settings import OSU_API_CACHE_ENABLED
+from app.database.cache import redis_cache
+
+# 各接口的缓存时间（秒）, 未列出的接口不缓存
+API_CACHE_TTL = {
+    "user": 120,
+    "users": 120,
+    "user_scores:recent": 15,
+    "user_scores:best": 300,
+    "user_scores:firsts": 300,
+    "beatmap": 3600,
+    "beatmaps": 3600,
+    "beatmapset": 3600,
+    "beatmap_attributes": 7 * 24 * 3600,
+    "beatmap_user_score": 60,
+    "match": 30,
+    "seasonal_backgrounds": 24 * 3600,
+}
+
+# 等待其他进程回源时的轮询间隔与次数
+_LOCK_TIMEOUT_MS = 10000
+_LOCK_POLL_INTERVAL = 0.05
+_LOCK_POLL_ATTEMPTS = 40
+
+_OSSAPI_PERSISTENT_ID = "ossapi"
+
+
+def _restore_model(model_type: type, data: dict) -> Model:
+    model = model_type.__new__(model_type)
+    model._ossapi_data = data
+    return model
+
+
+class _ModelPickler(pickle.Pickler):
+    """
+    ossapi 的 Model 重写了 __getattribute__, 无法直接反序列化, 这里按 _ossapi_data 还原,
+    并把模型上挂载的 Ossapi 实例替换为占位符
+    """
+
+    def reducer_override(self, obj):
+        if isinstance(obj, Model):
+            return _restore_model, (type(obj), obj._ossapi_data)
+        return NotImplemented
+
+    def persistent_id(self, obj):
+        if obj is settings.osu_api:
+            return _OSSAPI_PERSISTENT_ID
+        return None
+
+
+class _ModelUnpickler(pickle.Unpickler):
+    def persistent_load(self, pid):
+        if pid == _OSSAPI_PERSISTENT_ID:
+            return settings.osu_api
+        raise pickle.UnpicklingError(f"Unsupported persistent id: {pid}")
+
+
+def dumps_model(obj: Any) -> bytes:
+    """
+    序列化 osu! API 返回的对象
+
+    :param obj: ossapi 模型或其列表
+    :return: 序列化后的字节
+    """
+    buffer = io.BytesIO()
+    _ModelPickler(buffer, protocol=pickle.HIGHEST_PROTOCOL).dump(obj)
+    return buffer.getvalue()
+
+
+def loads_model(data: bytes) -> Any:
+    """
+    反序列化 osu! API 返回的对象, 模型会重新绑定到当前进程的 Ossapi 实例
+
+    :param data: dumps_model 的输出
+    :return: ossapi 模型或其列表
+    """
+    return _ModelUnpickler(io.BytesIO(data)).load()
+
+
+class ApiResponseCache:
+    """
+    基于 Redis 的 osu! API 响应缓存
+
+    同一进程内对同一个 key 的并发请求只会回源一次, 跨进程则通过 Redis 锁避免同时回源
+    """
+
+    def __init__(self, ttl: Dict[str, int], enabled: bool = True):
+        self._ttl = ttl
+        self._enabled = enabled
+        self._inflight: Dict[str, asyncio.Task] = {}
+        self._stats = defaultdict(lambda: {"hits": 0, "misses": 0})
+
+    @staticmethod
+    def make_key(endpoint: str, *args, **kwargs) -> str:
+        digest = hashlib.sha1(repr((args, sorted(kwargs.items()))).encode("utf-8")).hexdigest()
+        return f"osu_api:{endpoint}:{digest}"
+
+    async def get_or_fetch(self, endpoint: str, fetch: Callable[[], Awaitable[Any]], *args, **kwargs) -> Any:
+        """
+        读取缓存, 未命中时调用 fetch 回源并写入缓存
+
+        :param endpoint: 接口名, 用于查找 TTL 与统计
+        :param fetch: 回源函数
+        :param args: 接口参数, 用于生成缓存 key
+        :param kwargs: 接口参数, 用于生成缓存 key
+        :return: 接口返回的对象, 每次调用都是独立的副本
+        """
+        ttl = self._ttl.get(endpoint)
+        if not self._enabled or not ttl:
+            return await fetch()
+
+        key = self.make_key(endpoint, *args, **kwargs)
+        task = self._inflight.get(key)
+        if task is not None:
+            self._stats[endpoint]["hits"] += 1
+        else:
+            # 回源在缓存持有的任务中执行, 发起请求的调用方被取消时不影响其他等待者
+            task = asyncio.create_task(self._load(endpoint, key, ttl, fetch))
+            self._inflight[key] = task
+            task.add_done_callback(functools.partial(self._on_done, key))
+        return loads_model(await asyncio.shield(task))
+
+    def _on_done(self, key: str, task: asyncio.Task):
+        if self._inflight.get(key) is task:
+            del self._inflight[key]
+        if not task.cancelled():
+            # 所有调用方都已取消时避免 "exception was never retrieved" 警告
+            task.exception()
+
+    async def _load(self, endpoint: str, key: str, ttl: int, fetch: Callable[[], Awaitable[Any]]) -> bytes:
+        cached = await redis_cache.get(key)
+        if cached is not None:
+            self._stats[endpoint]["hits"] += 1
+            return cached
+
+        lock_key = f"{key}:lock"
+        lock_token = uuid.uuid4().hex
+        if not await redis_cache.set(lock_key, lock_token, px=_LOCK_TIMEOUT_MS, nx=True):
+            # 其他进程正在回源, 等待其写入缓存
+            for _ in range(_LOCK_POLL_ATTEMPTS):
+                await asyncio.sleep(_LOCK_POLL_INTERVAL)
+                cached = await redis_cache.get(key)
+                if cached is not None:
+                    self._stats[endpoint]["hits"] += 1
+                    return cached
+            lock_token = None
+
+        self._stats[endpoint]["misses"] += 1
+        try:
+            data = dumps_model(await fetch())
+            await redis_cache.set(key, data, ex=ttl)
+        finally:
+            if lock_token is not None and await redis_cache.get(lock_key) == lock_token.encode():
+                await redis_cache.delete(lock_key)
+        return data
+
+    def stats(self) -> Dict[str, dict]:
+        """
+        获取各接口的命中统计
+
+        :return: 以接口名为键的统计信息
+        """
+        result = {}
+        for endpoint, counter in self._stats.items():
+            total = counter["hits"] + counter["misses"]
+            result[endpoint] = dict(counter, hit_rate=counter["hits"] / total if total else 0)
+        return result
+
+
+api_cache = ApiResponseCache(API_CACHE_TTL, OSU_API_CACHE_ENABLED)
+
+
+def get_api_cache_stats() -> Dict[str, dict]:
+    return api_cache.stats()
@@ -1,7 +1,181 @@
-import redis
+import time
+from collections import OrderedDict
+from typing import Optional, Union
 
-from app.config.settings import REDIS_HOST, REDIS_PORT, REDIS_DB
+import redis.asyncio as aioredis
+from loguru import logger
+from redis.exceptions import RedisError
 
+from app.config.settings import (REDIS_HOST, REDIS_PORT, REDIS_DB, REDIS_MAX_CONNECTIONS, REDIS_HEALTH_CHECK_INTERVAL,
+                                 REDIS_RETRY_INTERVAL, LOCAL_CACHE_MAX_ITEMS)
 
-def get_redis_client():
-    return redis.Redis(host=REDIS_HOST, port=REDIS_PORT, db=REDIS_DB)
+
+class LocalTTLCache:
+    """
+    进程内的带过期时间缓存, 在 Redis 不可用时作为后备
+    """
+
+    def __init__(self, max_items: int):
+        self._max_items = max_items
+        self._data: OrderedDict[str, tuple] = OrderedDict()
+
+    def get(self, key: str) -> Optional[bytes]:
+        item = self._data.get(key)
+        if item is None:
+            return None
+        value, expires_at = item
+        if expires_at is not None and expires_at <= time.monotonic():
+            del self._data[key]
+            return None
+        self._data.move_to_end(key)
+        return value
+
+    def set(self, key: str, value: bytes, ex: Optional[float] = None, nx: bool = False) -> bool:
+        if nx and self.get(key) is not None:
+            return False
+        self._data[key] = (value, time.monotonic() + ex if ex else None)
+        self._data.move_to_end(key)
+        while len(self._data) > self._max_items:
+            self._data.popitem(last=False)
+        return True
+
+    def delete(self, key: str):
+        self._data.pop(key, None)
+
+    def clear(self):
+        self._data.clear()
+
+    def __len__(self):
+        return len(self._data)
+
+
+class RedisCache:
+    """
+    共享的异步 Redis 客户端
+
+    所有 Redis 读写都经过同一个连接池; Redis 出错时自动切换到进程内缓存,
+    并在 retry_interval 秒后重新尝试连接 Redis
+    """
+
+    def __init__(self, max_connections: int, health_check_interval: int, retry_interval: float,
+                 local_max_items: int):
+        self._max_connections = max_connections
+        self._health_check_interval = health_check_interval
+        self._retry_interval = retry_interval
+        self._pool: Optional[aioredis.ConnectionPool] = None
+        self._client: Optional[aioredis.Redis] = None
+        self._retry_at = 0.0
+        self._errors = 0
+        self._fallback_hits = 0
+        self.local = LocalTTLCache(local_max_items)
+
+    @property
+    def client(self) -> aioredis.Redis:
+        if self._client is None:
+            self._pool = aioredis.ConnectionPool(
+                host=REDIS_HOST,
+                port=REDIS_PORT,
+                db=REDIS_DB,
+                max_connections=self._max_connections,
+                health_check_interval=self._health_check_interval,
+            )
+            self._client = aioredis.Redis(connection_pool=self._pool)
+        return self._client
+
+    @property
+    def healthy(self) -> bool:
+        return time.monotonic() >= self._retry_at
+
+    def _mark_unhealthy(self, exc: Exception):
+        if self.healthy:
+            logger.warning(f"Redis unavailable, using in-process cache for {self._retry_interval}s: {exc}")
+        self._errors += 1
+        self._retry_at = time.monotonic() + self._retry_interval
+
+    async def connect(self) -> bool:
+        """
+        创建连接池并检查 Redis 是否可用, 在应用启动时调用
+
+        :return: Redis 是否可用
+        """
+        return await self.ping()
+
+    async def ping(self) -> bool:
+        """
+        健康检查
+
+        :return: Redis 是否可用
+        """
+        try:
+            await self.client.ping()
+        except (RedisError, OSError) as exc:
+            self._mark_unhealthy(exc)
+            return False
+        self._retry_at = 0.0
+        return True
+
+    async def get(self, key: str) -> Optional[bytes]:
+        if self.healthy:
+            try:
+                return await self.client.get(key)
+            except (RedisError, OSError) as exc:
+                self._mark_unhealthy(exc)
+        value = self.local.get(key)
+        if value is not None:
+            self._fallback_hits += 1
+        return value
+
+    async def set(self, key: str, value: Union[bytes, str], ex: Optional[int] = None, px: Optional[int] = None,
+                  nx: bool = False) -> bool:
+        if self.healthy:
+            try:
+                return bool(await self.client.set(key, value, ex=ex, px=px, nx=nx))
+            except (RedisError, OSError) as exc:
+                self._mark_unhealthy(exc)
+        if isinstance(value, str):
+            value = value.encode("utf-8")
+        return self.local.set(key, value, ex=px / 1000 if px else ex, nx=nx)
+
+    async def delete(self, key: str):
+        if self.healthy:
+            try:
+                await self.client.delete(key)
+                return
+            except (RedisError, OSError) as exc:
+                self._mark_unhealthy(exc)
+        self.local.delete(key)
+
+    async def close(self):
+        """
+        关闭连接池, 在应用关闭时调用
+        """
+        if self._client is not None:
+            await self._client.aclose()
+            await self._pool.disconnect()
+            self._client = None
+            self._pool = None
+
+    def stats(self) -> dict:
+        """
+        获取连接池与后备缓存的状态
+
+        :return: 统计信息
+        """
+        pool = self._pool
+        return {
+            "healthy": self.healthy,
+            "errors": self._errors,
+            "max_connections": self._max_connections,
+            "in_use_connections": len(pool._in_use_connections) if pool else 0,
+            "available_connections": len(pool._available_connections) if pool else 0,
+            "local_items": len(self.local),
+            "local_hits": self._fallback_hits,
+        }
+
+
+redis_cache = RedisCache(REDIS_MAX_CONNECTIONS, REDIS_HEALTH_CHECK_INTERVAL, REDIS_RETRY_INTERVAL,
+                         LOCAL_CACHE_MAX_ITEMS)
+
+
+def get_redis_stats() -> dict:
+    return redis_cache.stats()
@@ -0,0 +1,304 @@
+import hashlib
+import shutil
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Optional
+
+from loguru import logger
+
+from app.config.settings import DISK_CACHE_MAX_BYTES
+from app.osu_utils.file import cache_dir, read_file, write_file, run_file_io
+
+# 超出预算时淘汰到预算的这个比例, 避免每次写入都触发淘汰
+_EVICT_TARGET_RATIO = 0.9
+
+
+class DiskCache:
+    """
+    按内容寻址、有容量上限的磁盘缓存
+
+    文件以 sha256 命名保存在 blobs 目录下, key 到文件的映射保存在 SQLite 索引中,
+    并在内存中保留一份副本, 命中时只需要一次 stat 确认文件未被其他进程淘汰;
+    写入先写临时文件再 rename, 每个文件在本进程首次读取时校验一次 sha256;
+    总大小在内存中累计, 超过 max_bytes 时先用索引重新统计, 再按最近访问时间淘汰。
+    多个进程可以共享同一个缓存目录
+    """
+
+    def __init__(self, root: Path, max_bytes: int):
+        self._root = root
+        self._blob_dir = root / "blobs"
+        self._max_bytes = max_bytes
+        self._lock = threading.RLock()
+        self._conn: Optional[sqlite3.Connection] = None
+        # key -> [digest, size, accessed]
+        self._entries: dict[str, list] = {}
+        self._dirty: set[str] = set()
+        self._verified: set[str] = set()
+        # 本进程估计的文件总大小, 其他进程的写入与淘汰在 _evict 时重新统计
+        self._bytes = 0
+        self._hits = 0
+        self._misses = 0
+        self._evictions = 0
+        self._corrupted = 0
+
+    def _connect(self) -> sqlite3.Connection:
+        if self._conn is None:
+            for i in range(256):
+                (self._blob_dir / f"{i:02x}").mkdir(parents=True, exist_ok=True)
+            conn = sqlite3.connect(self._root / "index.sqlite3", timeout=10, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS entries ("
+                "key TEXT PRIMARY KEY, digest TEXT NOT NULL, size INTEGER NOT NULL, accessed REAL NOT NULL)"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS entries_digest ON entries (digest)")
+            conn.execute("CREATE INDEX IF NOT EXISTS entries_accessed ON entries (accessed)")
+            conn.commit()
+            self._entries = {
+                key: [digest, size, accessed]
+                for key, digest, size, accessed in conn.execute("SELECT key, digest, size, accessed FROM entries")
+            }
+            self._conn = conn
+            self._bytes = self._total_bytes()
+        return self._conn
+
+    def _blob_path(self, digest: str) -> Path:
+        return self._blob_dir / digest[:2] / digest
+
+    def _lookup(self, key: str) -> Optional[list]:
+        conn = self._connect()
+        entry = self._entries.get(key)
+        if entry is None:
+            # 其他进程可能已经写入
+            row = conn.execute("SELECT digest, size, accessed FROM entries WHERE key = ?", (key,)).fetchone()
+            if row is not None:
+                entry = self._entries[key] = list(row)
+        return entry
+
+    def _forget(self, key: str, digest: str):
+        # 文件已被其他进程淘汰, 丢弃内存中的记录
+        self._entries.pop(key, None)
+        self._dirty.discard(key)
+        self._verified.discard(digest)
+
+    def _read(self, key: str) -> Optional[tuple[Path, Optional[bytes]]]:
+        with self._lock:
+            entry = self._lookup(key)
+            if entry is None:
+                self._misses += 1
+                return None
+            digest = entry[0]
+            verified = digest in self._verified
+
+        path = self._blob_path(digest)
+        data = None
+        if verified:
+            if not path.exists():
+                with self._lock:
+                    self._forget(key, digest)
+                    self._misses += 1
+                return None
+        else:
+            # 读取与校验不持有锁, 避免慢速存储上阻塞其他 key 的访问
+            try:
+                data = read_file(path)
+            except FileNotFoundError:
+                data = None
+            if data is None or hashlib.sha256(data).hexdigest() != digest:
+                with self._lock:
+                    if data is None:
+                        self._forget(key, digest)
+                    else:
+                        logger.warning(f"Disk cache entry {key} is corrupted, discarding")
+                        self._corrupted += 1
+                        self._remove(key)
+                    self._misses += 1
+                return None
+
+        with self._lock:
+            self._verified.add(digest)
+            entry[2] = time.time()
+            self._dirty.add(key)
+            self._hits += 1
+        return path, data
+
+    def get_path(self, key: str) -> Optional[Path]:
+        """
+        获取缓存文件路径
+
+        :param key: 缓存 key
+        :return: 文件路径, 未命中时返回 None
+        """
+        result = self._read(key)
+        return result[0] if result is not None else None
+
+    def get(self, key: str) -> Optional[bytes]:
+        """
+        读取缓存内容
+
+        :param key: 缓存 key
+        :return: 文件内容, 未命中时返回 None
+        """
+        result = self._read(key)
+        if result is None:
+            return None
+        path, data = result
+        if data is None:
+            try:
+                data = read_file(path)
+            except FileNotFoundError:
+                with self._lock:
+                    self._forget(key, path.name)
+                return None
+        return data
+
+    def put(self, key: str, data: bytes) -> Path:
+        """
+        写入缓存
+
+        :param key: 缓存 key
+        :param data: 文件内容
+        :return: 文件路径
+        """
+        digest = hashlib.sha256(data).hexdigest()
+        path = self._blob_path(digest)
+        with self._lock:
+            conn = self._connect()
+            if not path.exists():
+                write_file(path, data)
+            self._verified.add(digest)
+
+            old = self._lookup(key)
+            if not conn.execute("SELECT 1 FROM entries WHERE digest = ? LIMIT 1", (digest,)).fetchone():
+                self._bytes += len(data)
+            now = time.time()
+            conn.execute("INSERT OR REPLACE INTO entries (key, digest, size, accessed) VALUES (?, ?, ?, ?)",
+                         (key, digest, len(data), now))
+            conn.commit()
+            self._entries[key] = [digest, len(data), now]
+            self._dirty.discard(key)
+            if old is not None and old[0] != digest:
+                self._release_blob(old[0])
+            self._evict()
+        return path
+
+    async def aget(self, key: str) -> Optional[bytes]:
+        return await run_file_io(self.get, key)
+
+    async def aget_path(self, key: str) -> Optional[Path]:
+        return await run_file_io(self.get_path, key)
+
+    async def aput(self, key: str, data: bytes) -> Path:
+        return await run_file_io(self.put, key, data)
+
+    def _release_blob(self, digest: str) -> int:
+        # 同一内容可能被多个 key 引用, 没有引用后才删除文件
+        if self._conn.execute("SELECT 1 FROM entries WHERE digest = ? LIMIT 1", (digest,)).fetchone():
+            return 0
+        path = self._blob_path(digest)
+        try:
+            size = path.stat().st_size
+            path.unlink()
+        except FileNotFoundError:
+            return 0
+        self._verified.discard(digest)
+        self._bytes -= size
+        return size
+
+    def _remove(self, key: str):
+        entry = self._entries.pop(key, None)
+        self._dirty.discard(key)
+        self._conn.execute("DELETE FROM entries WHERE key = ?", (key,))
+        self._conn.commit()
+        if entry is not None:
+            self._release_blob(entry[0])
+
+    def _total_bytes(self) -> int:
+        row = self._conn.execute(
+            "SELECT COALESCE(SUM(size), 0) FROM (SELECT MAX(size) AS size FROM entries GROUP BY digest)"
+        ).fetchone()
+        return row[0]
+
+    def _evict(self):
+        if self._bytes <= self._max_bytes:
+            return
+        # 累计值可能与其他进程的写入或淘汰有偏差, 淘汰前用索引重新统计
+        self._bytes = self._total_bytes()
+        if self._bytes <= self._max_bytes:
+            return
+        self.flush()
+        target = self._max_bytes * _EVICT_TARGET_RATIO
+        rows = self._conn.execute("SELECT key, digest FROM entries ORDER BY accessed").fetchall()
+        for key, digest in rows:
+            if self._bytes <= target:
+                break
+            self._entries.pop(key, None)
+            self._conn.execute("DELETE FROM entries WHERE key = ?", (key,))
+            self._release_blob(digest)
+            self._evictions += 1
+        self._conn.commit()
+
+    def flush(self):
+        """
+        把内存中的访问时间写回索引
+        """
+        with self._lock:
+            if self._conn is None or not self._dirty:
+                return
+            self._conn.executemany(
+                "UPDATE entries SET accessed = MAX(accessed, ?) WHERE key = ?",
+                [(self._entries[key][2], key) for key in self._dirty if key in self._entries]
+            )
+            self._conn.commit()
+            self._dirty.clear()
+
+    def clear(self):
+        """
+        清空缓存
+        """
+        with self._lock:
+            conn = self._connect()
+            conn.execute("DELETE FROM entries")
+            conn.commit()
+            self._entries.clear()
+            self._dirty.clear()
+            self._verified.clear()
+            self._bytes = 0
+            shutil.rmtree(self._blob_dir, ignore_errors=True)
+            for i in range(256):
+                (self._blob_dir / f"{i:02x}").mkdir(parents=True, exist_ok=True)
+
+    def close(self):
+        """
+        写回访问时间并关闭索引, 在应用关闭时调用
+        """
+        with self._lock:
+            if self._conn is not None:
+                self.flush()
+                self._conn.close()
+                self._conn = None
+
+    def stats(self) -> dict:
+        """
+        获取缓存统计
+
+        :return: 统计信息
+        """
+        with self._lock:
+            sizes = {digest: size for digest, size, _ in self._entries.values()}
+            total = self._hits + self._misses
+            return {
+                "items": len(self._entries),
+                "bytes": sum(sizes.values()),
+                "max_bytes": self._max_bytes,
+                "hits": self._hits,
+                "misses": self._misses,
+                "evictions": self._evictions,
+                "corrupted": self._corrupted,
+                "hit_rate": self._hits / total if total else 0,
+            }
+
+
+disk_cache = DiskCache(cache_dir / "store", DISK_CACHE_MAX_BYTES)
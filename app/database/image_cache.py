@@ -0,0 +1,159 @@
+import asyncio
+import functools
+import hashlib
+from io import BytesIO
+from typing import Awaitable, Callable, Dict, Optional
+
+from PIL import Image
+from loguru import logger
+
+from app.config.settings import IMAGE_CACHE_MAX_BYTES, DERIVED_IMAGE_CACHE_MAX_BYTES
+from app.database.disk_cache import DiskCache, disk_cache
+from app.database.lru import LRUCache
+from app.osu_utils.file import run_file_io
+
+
+def _decode(content: bytes) -> Image.Image:
+    image = Image.open(BytesIO(content)).convert("RGBA")
+    # 记录原文件摘要, 供派生图片缓存使用
+    image.info["digest"] = hashlib.sha256(content).hexdigest()
+    return image
+
+
+def _encode_png(image: Image.Image) -> bytes:
+    byt = BytesIO()
+    # 派生图片只作为缓存, 压缩率让位于编码速度
+    image.save(byt, "png", compress_level=1)
+    return byt.getvalue()
+
+
+class ImageCache:
+    """
+    解码后图片的内存缓存, 位于磁盘缓存之前
+
+    缓存的是 RGBA 格式的 PIL.Image, 按像素占用的字节数计入预算;
+    调用方拿到的是副本, 可以随意修改或 close()
+    """
+
+    def __init__(self, max_bytes: int):
+        self._cache = LRUCache(max_bytes)
+        self._inflight: Dict[str, asyncio.Task] = {}
+
+    async def _load(self, key: str, load: Callable[[], Awaitable[bytes]]) -> Image.Image:
+        image = await run_file_io(_decode, await load())
+        self._cache.put(key, image, image.width * image.height * 4)
+        return image
+
+    async def get(self, key: str, load: Callable[[], Awaitable[bytes]]) -> Image.Image:
+        """
+        获取解码后的图片
+
+        :param key: 缓存 key, 与磁盘缓存的 key 相同
+        :param load: 未命中时读取原始文件内容的函数
+        :return: RGBA 图片副本, info["digest"] 为原文件的 sha256
+        """
+        image = self._cache.get(key)
+        if image is None:
+            task = self._inflight.get(key)
+            if task is None:
+                task = asyncio.create_task(self._load(key, load))
+                self._inflight[key] = task
+                task.add_done_callback(functools.partial(self._on_done, key))
+            image = await asyncio.shield(task)
+        return image.copy()
+
+    def _on_done(self, key: str, task: asyncio.Task):
+        self._inflight.pop(key, None)
+        if not task.cancelled():
+            task.exception()
+
+    def clear(self):
+        self._cache.clear()
+
+    def stats(self) -> dict:
+        return self._cache.stats()
+
+
+class DerivedImageCache:
+    """
+    派生图片缓存, 保存裁切、模糊等预处理后的背景图
+
+    以 (原图 sha256, 主题, 处理步骤) 为 key, 先查内存, 再查磁盘缓存 (PNG),
+    都未命中时才执行处理; 原图没有摘要时不缓存, 每次直接处理
+
+    缓存不会感知处理函数本身的变化: 各主题用 BG_OPS 描述 preprocess_bg 的处理步骤,
+    修改处理逻辑时必须同步修改 BG_OPS, 旧的派生图片才会失效
+    """
+
+    def __init__(self, max_bytes: int, cache: DiskCache):
+        self._memory = LRUCache(max_bytes)
+        self._disk = cache
+        self._inflight: Dict[str, asyncio.Task] = {}
+        self._renders = 0
+        self._disk_hits = 0
+
+    async def _load(self, key: str, source: Image.Image,
+                    render: Callable[[Image.Image], Optional[Image.Image]]) -> Optional[Image.Image]:
+        content = await self._disk.aget(key)
+        if content is not None:
+            self._disk_hits += 1
+            image = await run_file_io(lambda: Image.open(BytesIO(content)).convert("RGBA"))
+        else:
+            self._renders += 1
+            image = await run_file_io(render, source)
+            if image is None:
+                return None
+            try:
+                await self._disk.aput(key, await run_file_io(_encode_png, image))
+            except Exception as e:
+                logger.warning(f"Failed to store derived image {key}: {e}")
+        self._memory.put(key, image, image.width * image.height * 4)
+        return image
+
+    async def get(self, source: Image.Image, theme: str, ops: str,
+                  render: Callable[[Image.Image], Optional[Image.Image]]) -> Optional[Image.Image]:
+        """
+        获取预处理后的图片
+
+        :param source: 原图, 由 ImageCache 返回时带有 info["digest"]
+        :param theme: 主题名称, 如 score_image/default
+        :param ops: 处理步骤的描述, 即主题的 BG_OPS
+        :param render: 处理函数, 输入原图返回处理后的图片
+        :return: 处理后的图片副本, 处理失败时为 None
+        """
+        digest = source.info.get("digest")
+        if digest is None:
+            self._renders += 1
+            return render(source)
+
+        key = f"derived/{digest}/{theme}/{ops}"
+        image = self._memory.get(key)
+        if image is None:
+            task = self._inflight.get(key)
+            if task is None:
+                task = asyncio.create_task(self._load(key, source, render))
+                self._inflight[key] = task
+                task.add_done_callback(functools.partial(self._on_done, key))
+            image = await asyncio.shield(task)
+            if image is None:
+                return None
+        return image.copy()
+
+    def _on_done(self, key: str, task: asyncio.Task):
+        self._inflight.pop(key, None)
+        if not task.cancelled():
+            task.exception()
+
+    def clear(self):
+        self._memory.clear()
+
+    def stats(self) -> dict:
+        return {
+            **self._memory.stats(),
+            "disk_hits": self._disk_hits,
+            "renders": self._renders,
+        }
+
+
+image_cache = ImageCache(IMAGE_CACHE_MAX_BYTES)
+derived_image_cache = DerivedImageCache(DERIVED_IMAGE_CACHE_MAX_BYTES, disk_cache)
@@ -0,0 +1,117 @@
+import threading
+from collections import OrderedDict
+from typing import Any, Callable, Hashable, Optional
+
+
+class LRUCache:
+    """
+    线程安全、按字节预算淘汰的 LRU 缓存
+
+    条目大小由调用方估算, 总大小超过 max_bytes 时从最久未使用的条目开始淘汰
+    """
+
+    def __init__(self, max_bytes: int):
+        self._max_bytes = max_bytes
+        self._data: OrderedDict[Hashable, tuple[Any, int]] = OrderedDict()
+        self._lock = threading.Lock()
+        self._bytes = 0
+        self._hits = 0
+        self._misses = 0
+        self._evictions = 0
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        with self._lock:
+            item = self._data.get(key)
+            if item is None:
+                self._misses += 1
+                return default
+            self._data.move_to_end(key)
+            self._hits += 1
+            return item[0]
+
+    def put(self, key: Hashable, value: Any, size: int):
+        """
+        写入缓存, 超过预算的单个条目不会被缓存
+
+        :param key: 缓存 key
+        :param value: 缓存值
+        :param size: 估算的字节数
+        """
+        if size > self._max_bytes:
+            return
+        with self._lock:
+            old = self._data.pop(key, None)
+            if old is not None:
+                self._bytes -= old[1]
+            self._data[key] = (value, size)
+            self._bytes += size
+            while self._bytes > self._max_bytes:
+                _, (_, evicted_size) = self._data.popitem(last=False)
+                self._bytes -= evicted_size
+                self._evictions += 1
+
+    def get_or_set(self, key: Hashable, factory: Callable[[], Any], sizeof: Callable[[Any], int]) -> Any:
+        """
+        读取缓存, 未命中时调用 factory 生成并写入
+
+        :param key: 缓存 key
+        :param factory: 生成缓存值的函数, 在锁外执行
+        :param sizeof: 估算缓存值字节数的函数
+        :return: 缓存值
+        """
+        value = self.get(key)
+        if value is None:
+            value = factory()
+            self.put(key, value, sizeof(value))
+        return value
+
+    def pop(self, key: Hashable) -> Optional[Any]:
+        with self._lock:
+            item = self._data.pop(key, None)
+            if item is None:
+                return None
+            self._bytes -= item[1]
+            return item[0]
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+            self._bytes = 0
+
+    def __len__(self):
+        return len(self._data)
+
+    def __contains__(self, key: Hashable) -> bool:
+        return key in self._data
+
+    def stats(self) -> dict:
+        """
+        获取缓存统计
+
+        :return: 统计信息
+        """
+        with self._lock:
+            total = self._hits + self._misses
+            return {
+                "items": len(self._data),
+                "bytes": self._bytes,
+                "max_bytes": self._max_bytes,
+                "hits": self._hits,
+                "misses": self._misses,
+                "evictions": self._evictions,
+                "hit_rate": self._hits / total if total else 0,
+            }
+
+
+def merge_lru_stats(stats: list[dict]) -> dict:
+    """
+    汇总多个进程中同一缓存的统计
+
+    :param stats: LRUCache.stats() 的返回值列表
+    :return: 合并后的统计信息
+    """
+    merged = {key: sum(item[key] for item in stats)
+              for key in ("items", "bytes", "max_bytes", "hits", "misses", "evictions")}
+    total = merged["hits"] + merged["misses"]
+    merged["hit_rate"] = merged["hits"] / total if total else 0
+    return merged
@@ -0,0 +1,114 @@
+from pathlib import Path
+from typing import Callable, Hashable, Iterable, Optional, Tuple, Union
+
+from PIL import Image
+from loguru import logger
+
+from app.config.settings import ASSET_CACHE_MAX_BYTES
+from app.database.lru import LRUCache
+
+THEMES_PATH = Path(__file__).parent.parent / "themes"
+
+
+def _sizeof(image: Image.Image) -> int:
+    return image.width * image.height * 4
+
+
+def _readonly_view(image: Image.Image) -> Image.Image:
+    # 与缓存共享同一块像素内存, readonly 的图片在被修改前会先复制一份 (copy-on-write),
+    # 调用方可以直接 alpha_composite、ImageDraw 或 close(), 不会影响缓存
+    view = image._new(image.im)
+    view.readonly = 1
+    return view
+
+
+class AssetStore:
+    """
+    主题静态素材的内存缓存
+
+    layout、mod、rank、国旗等 PNG 只解码一次, 主题中固定尺寸的缩放结果也一并缓存;
+    返回只读图片, 不需要每次绘制都读取文件和解码
+    """
+
+    def __init__(self, max_bytes: int):
+        self._cache = LRUCache(max_bytes)
+        self._max_bytes = max_bytes
+
+    def _load(self, path: str, size: Optional[Tuple[int, int]], variant: Optional[Hashable] = None,
+              render: Optional[Callable[[Image.Image], Image.Image]] = None) -> Image.Image:
+        if size is not None:
+            image = self._get(path, None, variant, render).resize(size)
+        elif variant is not None:
+            image = render(_readonly_view(self._get(path, None)))
+        else:
+            with Image.open(path) as f:
+                image = f.convert("RGBA")
+        image.readonly = 1
+        return image
+
+    def _get(self, path: str, size: Optional[Tuple[int, int]], variant: Optional[Hashable] = None,
+             render: Optional[Callable[[Image.Image], Image.Image]] = None) -> Image.Image:
+        return self._cache.get_or_set((path, variant, size), lambda: self._load(path, size, variant, render), _sizeof)
+
+    def get(self, path: Union[str, Path], size: Optional[Tuple[int, int]] = None) -> Image.Image:
+        """
+        获取素材图片
+
+        :param path: 素材文件路径
+        :param size: 缩放后的尺寸, 为 None 时返回原图
+        :return: RGBA 只读图片, 修改时自动复制
+        """
+        return _readonly_view(self._get(str(path), tuple(size) if size is not None else None))
+
+    def get_variant(self, path: Union[str, Path], variant: Hashable, render: Callable[[Image.Image], Image.Image],
+                    size: Optional[Tuple[int, int]] = None) -> Image.Image:
+        """
+        获取由素材加工得到的图片, 如按颜色着色的星级徽章, 加工结果与缩放结果一并缓存
+
+        :param path: 素材文件路径
+        :param variant: 区分加工方式的 key, 相同 key 的 render 需要产生相同的结果
+        :param render: 加工函数, 传入只读的原图, 返回新图片
+        :param size: 缩放后的尺寸, 为 None 时返回加工结果原图
+        :return: RGBA 只读图片, 修改时自动复制
+        """
+        return _readonly_view(self._get(str(path), tuple(size) if size is not None else None, variant, render))
+
+    def preload(self, paths: Iterable[Path]) -> int:
+        """
+        预先解码素材, 超出缓存预算后停止
+
+        :param paths: 素材文件路径
+        :return: 预加载的图片数量
+        """
+        count, total = 0, 0
+        for path in paths:
+            try:
+                image = self._get(str(path), None)
+            except Exception as e:
+                logger.warning(f"Failed to preload asset {path}: {e}")
+                continue
+            total += _sizeof(image)
+            if total > self._max_bytes:
+                logger.warning(f"Asset cache is full, preloaded {count} assets")
+                break
+            count += 1
+        return count
+
+    def preload_themes(self) -> int:
+        """
+        预加载所有主题 assets 目录下的 PNG, 在实际绘图的进程中调用
+
+        :return: 预加载的图片数量
+        """
+        count = self.preload(sorted(THEMES_PATH.glob("*/*/assets/**/*.png")))
+        logger.info(f"Preloaded {count} theme assets")
+        return count
+
+    def clear(self):
+        self._cache.clear()
+
+    def stats(self) -> dict:
+        return self._cache.stats()
+
+
+asset_store = AssetStore(ASSET_CACHE_MAX_BYTES)
@@ -0,0 +1,58 @@
+import asyncio
+import multiprocessing
+from typing import Optional
+
+from app.config.settings import RENDER_WORKERS, RENDER_QUEUE_SIZE, RENDER_TIMEOUT, ASSET_PRELOAD
+from app.database.api_cache import dumps_model, loads_model
+from app.database.cache import redis_cache
+from app.draw.asset_store import asset_store
+from app.osu_utils.worker_pool import WorkerPool
+from app.themes.theme_interface import ThemeStrategy
+from app.themes.theme_manager import theme_registry
+
+# 绘图子进程中的事件循环
+_loop: Optional[asyncio.AbstractEventLoop] = None
+
+
+def _init_worker():
+    # 主题绘制过程中还会下载头像、读取缓存, 每个子进程保留一个事件循环,
+    # 进程内的 http 连接池与各级缓存可以在多次绘制之间复用
+    global _loop
+    _loop = asyncio.new_event_loop()
+    asyncio.set_event_loop(_loop)
+    _loop.run_until_complete(redis_cache.connect())
+    theme_registry.load_all()
+    if ASSET_PRELOAD:
+        asset_store.preload_themes()
+
+
+def _render_job(feature_name: str, theme_name: str, payload: bytes) -> bytes:
+    themes = theme_registry.get_themes(feature_name)
+    try:
+        args, resources = loads_model(payload)
+        return _loop.run_until_complete(themes[theme_name].process_data(*args, resources=resources))
+    except Exception as e:
+        # 主题中抛出的异常不一定能被 pickle, 统一转换后再返回主进程
+        raise RuntimeError(f"{type(e).__name__}: {e}") from None
+
+
+# 子进程使用 spawn 启动, 不继承主进程中绑定在其事件循环上的连接与锁
+render_pool = WorkerPool("Render", RENDER_WORKERS, RENDER_QUEUE_SIZE, timeout=RENDER_TIMEOUT,
+                         mp_context=multiprocessing.get_context("spawn"), initializer=_init_worker)
+
+
+async def render_theme(feature_name: str, theme_name: str, theme_strategy: ThemeStrategy, *args) -> bytes:
+    """
+    在绘图进程池中执行主题绘制, 进程池未启用时直接在事件循环中绘制;
+    主题的 prepare 总是在当前进程中执行, 子进程不发出网络请求
+
+    :param feature_name: 主题目录名, 如 score_image
+    :param theme_name: 主题名称, 需要已确认存在
+    :param theme_strategy: 主进程中的主题实例, 进程池未启用时使用
+    :param args: 传给 process_data 的参数, 需要可以被 dumps_model 序列化
+    :return: 图片内容
+    """
+    resources = await theme_strategy.prepare(*args)
+    if not render_pool.enabled:
+        return await theme_strategy.process_data(*args, resources=resources)
+    return await render_pool.run(_render_job, feature_name, theme_name, dumps_model((args, resources)))
@@ -1,17 +1,19 @@
 from typing import List
 
+from PIL import Image
 from loguru import logger
 from ossapi import User, Score
 from ossapi.models import BeatmapDifficultyAttributes
 
 from app.osu_utils.pp import PPCalculator
-from app.themes.theme_manager import discover_and_load_themes
+from app.draw.render import render_theme
+from app.themes.theme_manager import theme_registry
 
 
 class ScoreImageStrategy:
     def __init__(self, present_play_record: List[Score], user_info: User, pp_calculate: PPCalculator,
-                 set_bg: bytes, beatmap_attributes: BeatmapDifficultyAttributes) -> None:
-        self._themes = discover_and_load_themes('score_image')
+                 set_bg: Image.Image, beatmap_attributes: BeatmapDifficultyAttributes) -> None:
+        self._themes = theme_registry.get_themes('score_image')
         self._present_play_record = present_play_record
         self._user_info = user_info
         self._pp_calculate = pp_calculate
@@ -22,10 +24,12 @@ class ScoreImageStrategy:
         theme_strategy = self._themes.get(theme_name)
         if not theme_strategy:
             logger.error(f"Theme {theme_name} not found, using default theme")
+            theme_name = 'default'
             theme_strategy = self._themes.get('default')
 
         try:
-            processed_data = await theme_strategy.process_data(
+            processed_data = await render_theme(
+                'score_image', theme_name, theme_strategy,
                 self._present_play_record, self._user_info, self._pp_calculate, self._set_bg, self._beatmap_attributes
             )
         except Exception as e:
@@ -0,0 +1,45 @@
+from pathlib import Path
+from typing import Optional, Tuple, Union
+
+import numpy as np
+from PIL import Image
+
+from app.draw.asset_store import asset_store
+from app.draw.color import ColorArr
+
+
+def get_stars_color(stars: float) -> Tuple[int, int, int]:
+    """
+    获取星级对应的颜色, ColorArr 只有 900 档, 同一档内的星级颜色相同
+    :param stars: 星级
+    :return: RGB 颜色
+    """
+    if stars < 0.1:
+        return 170, 170, 170
+    if stars >= 9:
+        return 0, 0, 0
+    r, g, b, a = ColorArr[int(stars * 100)]
+    return int(r), int(g), int(b)
+
+
+def _render_stars_badge(stars_img: Image.Image, color: Tuple[int, int, int]) -> Image.Image:
+    # 填充背景
+    img = Image.new("RGBA", stars_img.size, color)
+    img.paste(stars_img, (0, 0), stars_img)
+    # 把白色变透明
+    arr = np.array(img)
+    mask = (arr[:, :, 0] == 255) & (arr[:, :, 1] == 255) & (arr[:, :, 2] == 255)
+    arr[:, :, 3][mask] = 0
+    return Image.fromarray(arr)
+
+
+def draw_stars_badge(stars_png: Union[str, Path], stars: float, size: Optional[Tuple[int, int]] = None) -> Image.Image:
+    """
+    绘制星级徽章, 每种颜色与尺寸只绘制一次
+    :param stars_png: 主题中的星星底图
+    :param stars: 星级
+    :param size: 缩放后的尺寸, 为 None 时与底图相同
+    :return: RGBA 只读图片
+    """
+    color = get_stars_color(stars)
+    return asset_store.get_variant(stars_png, ("stars", color), lambda img: _render_stars_badge(img, color), size)
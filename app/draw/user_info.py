@@ -1,18 +1,27 @@
-from typing import List
+from types import SimpleNamespace
+from typing import List, Optional
 
 from loguru import logger
 from ossapi.models import User, Score
 
-from app.themes.theme_manager import discover_and_load_themes
+from app.draw.render import render_theme
+from app.themes.theme_manager import theme_registry
 from app.user.models import UserOsuInfoHistory
 
 
+def _history_snapshot(history: Optional[UserOsuInfoHistory]) -> Optional[SimpleNamespace]:
+    if history is None:
+        return None
+    return SimpleNamespace(**{name: getattr(history, name) for name in history._meta.fields_map})
+
+
 class UserInfoImageStrategy:
     def __init__(self, user_info: User, user_history_info: UserOsuInfoHistory, game_mode: str,
                  user_scores: List[Score]) -> None:
-        self._themes = discover_and_load_themes('user_info_image')
+        self._themes = theme_registry.get_themes('user_info_image')
         self._user_info = user_info
-        self._user_history_info = user_history_info
+        # tortoise 模型无法传给绘图进程, 转换为属性相同的快照
+        self._user_history_info = _history_snapshot(user_history_info)
         self._game_mode = game_mode
         self._user_scores = user_scores
 
@@ -20,11 +29,12 @@ class UserInfoImageStrategy:
         theme_strategy = self._themes.get(theme_name)
         if not theme_strategy:
             logger.error(f"Theme {theme_name} not found, using default theme")
+            theme_name = 'default'
             theme_strategy = self._themes.get('default')
 
         try:
-            processed_data = await theme_strategy.process_data(self._user_info, self._user_history_info,
-                                                               self._game_mode, self._user_scores)
+            processed_data = await render_theme('user_info_image', theme_name, theme_strategy, self._user_info,
+                                                self._user_history_info, self._game_mode, self._user_scores)
         except Exception as e:
             raise e
 
@@ -33,7 +43,7 @@ class UserInfoImageStrategy:
 
 class UserBPAnalyzeImageStrategy:
     def __init__(self, user_info: User, user_scores: List[Score]) -> None:
-        self._themes = discover_and_load_themes('bp_analyze_image')
+        self._themes = theme_registry.get_themes('bp_analyze_image')
         self._user_info = user_info
         self._user_scores = user_scores
 
@@ -1,6 +1,9 @@
-from typing import Tuple
+import functools
+import math
+from typing import List, Optional, Tuple
 
-from PIL import Image, ImageDraw
+import numpy as np
+from PIL import Image, ImageColor, ImageDraw
 
 
 def crop_image(bg: Image.Image, fix_width: int, fix_height: int) -> Image.Image:
@@ -102,3 +105,51 @@ def draw_rounded_rectangle(draw: ImageDraw.Draw, xy: Tuple[Tuple[int, int], Tupl
                     bottom_right[0] - corner_radius, bottom_right[1]], fill=fill)
     draw.rectangle([top_left[0], top_left[1] + corner_radius,
                     bottom_right[0], bottom_right[1] - corner_radius], fill=fill)
+
+
+@functools.lru_cache(maxsize=8)
+def _polar_grid(size: int) -> Tuple[np.ndarray, np.ndarray]:
+    # 以像素中心计算到图片中心的距离与从 12 点方向开始的顺时针角度
+    coords = np.arange(size, dtype=np.float64) + 0.5 - size / 2
+    dx, dy = np.meshgrid(coords, coords)
+    return np.hypot(dx, dy), np.arctan2(dx, -dy) % (2 * math.pi)
+
+
+def draw_ring(size: int, outer_radius: float, inner_radius: float,
+              segments: List[Tuple[float, Optional[str]]]) -> Image.Image:
+    """
+    绘制抗锯齿的环形图, 从 12 点方向开始顺时针排列, 效果与 matplotlib 的环形饼图一致
+    :param size: 图片边长, 圆心位于图片中心
+    :param outer_radius: 外半径
+    :param inner_radius: 内半径
+    :param segments: (占比, 颜色) 列表, 占比之和大于 1 时按总和归一化, 颜色为 None 的部分留空
+    :return: pillow Image 对象
+    """
+    total = sum(fraction for fraction, _ in segments)
+    if total > 1:
+        segments = [(fraction / total, color) for fraction, color in segments]
+    radius, angle = _polar_grid(size)
+    # 只计算环上的像素, 按像素到边界的距离计算覆盖率, 实现抗锯齿
+    index = np.nonzero((radius > inner_radius - 0.5) & (radius < outer_radius + 0.5))
+    radius, angle = radius[index], angle[index]
+    coverage = np.clip(outer_radius - radius + 0.5, 0, 1) * np.clip(radius - inner_radius + 0.5, 0, 1)
+    rgb = np.zeros((len(radius), 3))
+    alpha = np.zeros(len(radius))
+    start = 0.0
+    for fraction, color in segments:
+        span = fraction * 2 * math.pi
+        if color is not None and span > 0:
+            if span >= 2 * math.pi:
+                weight = coverage
+            else:
+                offset = (angle - start) % (2 * math.pi)
+                distance = np.where(offset < span, np.minimum(offset, span - offset),
+                                    -np.minimum(offset - span, 2 * math.pi - offset))
+                weight = coverage * np.clip(distance * radius + 0.5, 0, 1)
+            rgb += weight[:, None] * ImageColor.getrgb(color)[:3]
+            alpha += weight
+        start += span
+    # 相邻部分在边界处的覆盖率之和为 1, 按 alpha 还原颜色
+    rgba = np.zeros((size, size, 4), dtype=np.uint8)
+    rgba[index] = np.round(np.column_stack((rgb / np.maximum(alpha, 1e-6)[:, None], np.clip(alpha, 0, 1) * 255)))
+    return Image.fromarray(rgba, "RGBA")
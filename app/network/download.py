@@ -0,0 +1,92 @@
+import asyncio
+import functools
+from pathlib import Path
+from typing import Awaitable, Callable, Dict
+
+from app.database.disk_cache import DiskCache, disk_cache
+
+
+class DownloadManager:
+    """
+    下载管理
+
+    同一个 key 的并发请求共享一次下载, 下载成功且内容非空后才写入磁盘缓存,
+    失败时所有等待者都会收到同一个异常, 下次请求重新下载
+    """
+
+    def __init__(self, cache: DiskCache):
+        self._cache = cache
+        self._inflight: Dict[str, asyncio.Task] = {}
+        self._downloads = 0
+        self._coalesced = 0
+        self._failures = 0
+
+    async def _download(self, key: str, download: Callable[[], Awaitable[bytes]]) -> tuple[Path, bytes]:
+        self._downloads += 1
+        try:
+            content = await download()
+            if not content:
+                raise ValueError(f"Downloaded file for {key} is empty")
+        except Exception:
+            self._failures += 1
+            raise
+        return await self._cache.aput(key, content), content
+
+    def _on_done(self, key: str, task: asyncio.Task):
+        self._inflight.pop(key, None)
+        # 所有等待者都已取消时, 取出异常以免事件循环报告未处理的异常
+        if not task.cancelled():
+            task.exception()
+
+    async def _fetch(self, key: str, download: Callable[[], Awaitable[bytes]]) -> tuple[Path, bytes]:
+        task = self._inflight.get(key)
+        if task is None:
+            task = asyncio.create_task(self._download(key, download))
+            self._inflight[key] = task
+            task.add_done_callback(functools.partial(self._on_done, key))
+        else:
+            self._coalesced += 1
+        # 单个等待者被取消时不影响其他等待者
+        return await asyncio.shield(task)
+
+    async def get(self, key: str, download: Callable[[], Awaitable[bytes]]) -> bytes:
+        """
+        读取缓存, 未命中时下载
+
+        :param key: 磁盘缓存 key
+        :param download: 下载函数, 返回文件内容
+        :return: 文件内容
+        """
+        content = await self._cache.aget(key)
+        if content is not None:
+            return content
+        return (await self._fetch(key, download))[1]
+
+    async def get_path(self, key: str, download: Callable[[], Awaitable[bytes]]) -> Path:
+        """
+        读取缓存文件路径, 未命中时下载
+
+        :param key: 磁盘缓存 key
+        :param download: 下载函数, 返回文件内容
+        :return: 文件路径
+        """
+        path = await self._cache.aget_path(key)
+        if path is not None:
+            return path
+        return (await self._fetch(key, download))[0]
+
+    def stats(self) -> dict:
+        """
+        获取下载统计
+
+        :return: 统计信息
+        """
+        return {
+            "inflight": len(self._inflight),
+            "downloads": self._downloads,
+            "coalesced": self._coalesced,
+            "failures": self._failures,
+        }
+
+
+download_manager = DownloadManager(disk_cache)
@@ -0,0 +1,168 @@
+import asyncio
+import random
+import time
+from typing import Callable, Dict, List, Optional
+
+import httpx
+from loguru import logger
+
+from app.config.settings import MIRROR_HEDGE_DELAY, MIRROR_TIMEOUT, MIRROR_MAX_ATTEMPTS
+from app.network.network import get_http_client
+
+# 延迟与错误率的指数滑动平均系数
+_EWMA_ALPHA = 0.2
+# 连续失败达到该次数后暂时跳过镜像, 跳过时长按失败次数指数增长
+_SKIP_AFTER_FAILURES = 3
+_BACKOFF_BASE = 0.5
+_BACKOFF_MAX = 60.0
+
+
+class MirrorHealth:
+    """
+    单个镜像的健康状态
+    """
+
+    def __init__(self):
+        self.requests = 0
+        self.failures = 0
+        self.consecutive_failures = 0
+        self.latency: Optional[float] = None
+        self.error_rate = 0.0
+        self.skip_until = 0.0
+
+    def _update_latency(self, latency: float):
+        self.latency = latency if self.latency is None else self.latency + _EWMA_ALPHA * (latency - self.latency)
+
+    def record(self, success: bool, latency: float):
+        self.requests += 1
+        self.error_rate += _EWMA_ALPHA * ((0.0 if success else 1.0) - self.error_rate)
+        if success:
+            self.consecutive_failures = 0
+            self.skip_until = 0.0
+            self._update_latency(latency)
+        else:
+            self.failures += 1
+            self.consecutive_failures += 1
+            if self.consecutive_failures >= _SKIP_AFTER_FAILURES:
+                exponent = self.consecutive_failures - _SKIP_AFTER_FAILURES
+                self.skip_until = time.monotonic() + min(_BACKOFF_BASE * 2 ** exponent, _BACKOFF_MAX)
+
+    def record_cancelled(self, elapsed: float):
+        # 被其他镜像抢先时只知道延迟至少为 elapsed, 按此计入, 避免慢镜像一直排在前面
+        self.requests += 1
+        self._update_latency(elapsed)
+
+    @property
+    def score(self) -> float:
+        # 没有记录的镜像优先尝试一次, 只失败过的排在最后; 错误率越高, 等效延迟越大
+        if self.latency is None:
+            return float("inf") if self.requests else 0.0
+        return self.latency * (1 + 4 * self.error_rate)
+
+
+def _is_not_empty(response: httpx.Response) -> bool:
+    return len(response.content) > 0
+
+
+class MirrorClient:
+    """
+    多镜像下载
+
+    按健康度排序依次发出对冲请求: 最优镜像 hedge_delay 秒内没有返回时再请求下一个,
+    任一镜像返回有效内容后立即取消其余请求; 连续失败的镜像会被暂时跳过,
+    整轮失败后按指数退避重试
+    """
+
+    def __init__(self, hedge_delay: float, timeout: float, max_attempts: int):
+        self._hedge_delay = hedge_delay
+        self._timeout = timeout
+        self._max_attempts = max_attempts
+        self._health: Dict[str, MirrorHealth] = {}
+
+    def _get_health(self, url: str) -> MirrorHealth:
+        host = httpx.URL(url).host
+        health = self._health.get(host)
+        if health is None:
+            health = self._health[host] = MirrorHealth()
+        return health
+
+    def _order(self, urls: List[str]) -> List[str]:
+        now = time.monotonic()
+        available = [url for url in urls if self._get_health(url).skip_until <= now]
+        # 所有镜像都在跳过期内时仍然全部尝试, 不直接失败
+        return sorted(available or urls, key=lambda url: self._get_health(url).score)
+
+    async def _request(self, url: str, validate: Callable[[httpx.Response], bool]) -> bytes:
+        health = self._get_health(url)
+        started_at = time.monotonic()
+        try:
+            response = await get_http_client(url).get(url, timeout=self._timeout, follow_redirects=True)
+            response.raise_for_status()
+            if not validate(response):
+                raise ValueError(f"Invalid response from {url}: {response.headers.get('Content-Type', '')}")
+        except asyncio.CancelledError:
+            health.record_cancelled(time.monotonic() - started_at)
+            raise
+        except Exception:
+            health.record(False, time.monotonic() - started_at)
+            raise
+        health.record(True, time.monotonic() - started_at)
+        return response.content
+
+    async def _race(self, urls: List[str], validate: Callable[[httpx.Response], bool]) -> bytes:
+        queue = list(urls)
+        pending = set()
+        errors = []
+        try:
+            while queue or pending:
+                if queue:
+                    pending.add(asyncio.create_task(self._request(queue.pop(0), validate)))
+                done, pending = await asyncio.wait(pending, timeout=self._hedge_delay if queue else None,
+                                                   return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        return task.result()
+                    errors.append(task.exception())
+        finally:
+            for task in pending:
+                task.cancel()
+        raise Exception(f"All mirrors failed: {'; '.join(str(error) for error in errors)}")
+
+    async def fetch(self, urls: List[str], validate: Callable[[httpx.Response], bool] = _is_not_empty) -> bytes:
+        """
+        从多个镜像下载同一个文件
+
+        :param urls: 镜像 URL 列表
+        :param validate: 校验响应是否有效, 默认要求内容非空
+        :return: 文件内容
+        """
+        for attempt in range(self._max_attempts):
+            try:
+                return await self._race(self._order(urls), validate)
+            except Exception as e:
+                logger.warning(f"Attempt {attempt + 1} of {self._max_attempts} failed: {e}")
+                if attempt + 1 < self._max_attempts:
+                    delay = min(_BACKOFF_BASE * 2 ** attempt, _BACKOFF_MAX)
+                    await asyncio.sleep(delay * random.uniform(0.5, 1.5))
+        raise Exception(f"Failed to download after {self._max_attempts} attempts")
+
+    def stats(self) -> Dict[str, dict]:
+        """
+        获取各镜像的健康状态, 时间单位为毫秒
+
+        :return: 以 host 为键的统计信息
+        """
+        now = time.monotonic()
+        return {
+            host: {
+                "requests": health.requests,
+                "failures": health.failures,
+                "error_rate": health.error_rate,
+                "latency_ms": health.latency * 1000 if health.latency is not None else None,
+                "skipped_for_ms": max(health.skip_until - now, 0) * 1000,
+            }
+            for host, health in self._health.items()
+        }
+
+
+mirror_client = MirrorClient(MIRROR_HEDGE_DELAY, MIRROR_TIMEOUT, MIRROR_MAX_ATTEMPTS)
@@ -1,9 +1,107 @@
-import asyncio
-from typing import Union, Dict, List
+from typing import Union, Dict
 
 import httpx
 from loguru import logger
 
+from app.config.settings import (HTTP_MAX_CONNECTIONS, HTTP_MAX_KEEPALIVE_CONNECTIONS, HTTP_KEEPALIVE_EXPIRY,
+                                 HTTP2_ENABLED)
+
+try:
+    import h2  # noqa: F401
+    _H2_AVAILABLE = True
+except ImportError:
+    _H2_AVAILABLE = False
+
+if HTTP2_ENABLED and not _H2_AVAILABLE:
+    logger.warning("HTTP/2 is enabled but the h2 package is not installed, falling back to HTTP/1.1")
+
+
+class HttpClientPool:
+    """
+    进程级 httpx.AsyncClient 注册表, 每个 host 复用同一个 client 及其连接池
+    """
+
+    def __init__(self):
+        self._clients: Dict[str, httpx.AsyncClient] = {}
+        self._request_counts: Dict[str, int] = {}
+
+    def get_client(self, url: str) -> httpx.AsyncClient:
+        """
+        获取 URL 对应 host 的共享 client, 不存在时创建
+
+        :param url: 请求的 URL
+        :return: httpx.AsyncClient
+        """
+        host = httpx.URL(url).host
+        client = self._clients.get(host)
+        if client is None or client.is_closed:
+            client = self._create_client()
+            self._clients[host] = client
+        self._request_counts[host] = self._request_counts.get(host, 0) + 1
+        return client
+
+    @staticmethod
+    def _create_client() -> httpx.AsyncClient:
+        limits = httpx.Limits(
+            max_connections=HTTP_MAX_CONNECTIONS,
+            max_keepalive_connections=HTTP_MAX_KEEPALIVE_CONNECTIONS,
+            keepalive_expiry=HTTP_KEEPALIVE_EXPIRY,
+        )
+        return httpx.AsyncClient(limits=limits, http2=HTTP2_ENABLED and _H2_AVAILABLE)
+
+    async def close(self):
+        """
+        关闭所有 client, 在应用关闭时调用
+        """
+        clients = list(self._clients.values())
+        self._clients.clear()
+        for client in clients:
+            await client.aclose()
+
+    def stats(self) -> Dict[str, dict]:
+        """
+        获取各 host 连接池的使用情况
+
+        :return: 以 host 为键的统计信息
+        """
+        result = {}
+        for host, client in self._clients.items():
+            # httpx 没有公开连接池, 这里读取 transport 内部的 httpcore 连接池
+            pool = getattr(client._transport, "_pool", None)
+            connections = list(pool.connections) if pool is not None else []
+            idle = sum(1 for connection in connections if connection.is_idle())
+            result[host] = {
+                "requests": self._request_counts.get(host, 0),
+                "connections": len(connections),
+                "active": len(connections) - idle,
+                "idle": idle,
+                "max_connections": HTTP_MAX_CONNECTIONS,
+                "max_keepalive_connections": HTTP_MAX_KEEPALIVE_CONNECTIONS,
+                "http2": HTTP2_ENABLED and _H2_AVAILABLE,
+            }
+        return result
+
+
+http_client_pool = HttpClientPool()
+
+
+def get_http_client(url: str) -> httpx.AsyncClient:
+    """
+    获取 URL 对应 host 的共享 client
+
+    :param url: 请求的 URL
+    :return: httpx.AsyncClient
+    """
+    return http_client_pool.get_client(url)
+
+
+async def close_http_clients():
+    await http_client_pool.close()
+
+
+def get_http_pool_stats() -> Dict[str, dict]:
+    return http_client_pool.stats()
+
 
 async def httpx_request(method: str, url: str, headers: Dict[str, str] = None, data: Union[str, Dict[str, str]] = None,
                         params: Dict[str, str] = None, max_retries: int = 3, timeout: int = 5):
@@ -24,10 +122,11 @@ async def httpx_request(method: str, url: str, headers: Dict[str, str] = None, d
 
     while retries < max_retries:
         try:
-            async with httpx.AsyncClient(timeout=timeout_config) as client:
-                response = await client.request(method, url, headers=headers, data=data, params=params)
-                response.raise_for_status()
-                return response.json()
+            client = get_http_client(url)
+            response = await client.request(method, url, headers=headers, data=data, params=params,
+                                            timeout=timeout_config)
+            response.raise_for_status()
+            return response.json()
 
         except (httpx.ReadTimeout, httpx.ConnectTimeout):
             retries += 1
@@ -56,10 +155,10 @@ async def httpx_download_request(url: str, max_retries: int = 3, timeout: int =
 
     while retries < max_retries:
         try:
-            async with httpx.AsyncClient(timeout=timeout_config) as client:
-                response = await client.request("GET", url)
-                response.raise_for_status()
-                return response
+            client = get_http_client(url)
+            response = await client.request("GET", url, timeout=timeout_config)
+            response.raise_for_status()
+            return response
 
         except (httpx.ReadTimeout, httpx.ConnectTimeout):
             retries += 1
@@ -72,29 +171,3 @@ async def httpx_download_request(url: str, max_retries: int = 3, timeout: int =
 
     logger.error("Maximum retry attempts reached, failing.")
     raise Exception("Maximum retry attempts reached, failing.")
-
-
-async def get_first_response(urls: List[str]):
-    """
-    并发请求多个 URL，返回第一个成功的响应
-
-    :param urls: 请求的 URL 列表
-    :return: 响应的 JSON 对象，或在所有请求失败时抛出异常
-    """
-    try:
-        async with httpx.AsyncClient() as client:
-            tasks = [client.get(url) for url in urls]
-            responses = await asyncio.gather(*tasks, return_exceptions=True)
-    except (httpx.ReadTimeout, httpx.ConnectTimeout):
-        raise Exception("Timeout occurred when requesting URLs.")
-
-    except httpx.HTTPStatusError as e:
-        # 处理非成功状态码
-        logger.error(f"HTTP error occurred: {e.response.status_code} {e.response.text}")
-        raise e
-
-    for response in responses:
-        if isinstance(response, httpx.Response):
-            return response
-
-    raise Exception("All requests failed.")
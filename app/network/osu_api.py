@@ -0,0 +1,81 @@
+import asyncio
+import functools
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional, List, Union, Callable, Any
+
+from ossapi import Ossapi
+from ossapi.models import (User, UserCompact, Score, Beatmap, Beatmapset, DifficultyAttributes, BeatmapUserScore,
+                           MatchResponse, SeasonalBackgrounds)
+
+from app.config import settings
+from app.config.settings import OSU_API_MAX_WORKERS
+from app.database.api_cache import api_cache
+
+
+class AsyncOsuApi:
+    """
+    osu! API 异步封装
+
+    Ossapi 是同步实现, 这里把每次调用放到独立的线程池中执行, 避免 API 往返阻塞事件循环,
+    返回结果按接口缓存到 Redis 中
+    """
+
+    def __init__(self, api: Ossapi, max_workers: int):
+        self._api = api
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="osu-api")
+
+    async def _call(self, func: Callable, *args, **kwargs) -> Any:
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, functools.partial(func, *args, **kwargs))
+
+    async def _cached(self, endpoint: str, func: Callable, *args, **kwargs) -> Any:
+        return await api_cache.get_or_fetch(endpoint, lambda: self._call(func, *args, **kwargs), *args, **kwargs)
+
+    async def user(self, user: Union[int, str], *, mode: Optional[str] = None, key: Optional[str] = None) -> User:
+        return await self._cached("user", self._api.user, user, mode=mode, key=key)
+
+    async def users(self, user_ids: List[int]) -> List[UserCompact]:
+        return await self._cached("users", self._api.users, user_ids)
+
+    async def user_scores(self, user_id: int, type: str, *, include_fails: Optional[bool] = None,
+                          mode: Optional[str] = None, limit: Optional[int] = None,
+                          offset: Optional[int] = None) -> List[Score]:
+        return await self._cached(f"user_scores:{type}", self._api.user_scores, user_id, type,
+                                  include_fails=include_fails, mode=mode, limit=limit, offset=offset)
+
+    async def beatmap(self, beatmap_id: Optional[int] = None) -> Beatmap:
+        return await self._cached("beatmap", self._api.beatmap, beatmap_id)
+
+    async def beatmaps(self, beatmap_ids: List[int]) -> List[Beatmap]:
+        return await self._cached("beatmaps", self._api.beatmaps, beatmap_ids)
+
+    async def beatmapset(self, beatmapset_id: Optional[int] = None, *,
+                         beatmap_id: Optional[int] = None) -> Beatmapset:
+        return await self._cached("beatmapset", self._api.beatmapset, beatmapset_id, beatmap_id=beatmap_id)
+
+    async def beatmap_attributes(self, beatmap_id: int, *, mods=None,
+                                 ruleset: Optional[str] = None) -> DifficultyAttributes:
+        return await self._cached("beatmap_attributes", self._api.beatmap_attributes, beatmap_id, mods=mods,
+                                  ruleset=ruleset)
+
+    async def beatmap_user_score(self, beatmap_id: int, user_id: int, *, mode: Optional[str] = None,
+                                 mods=None) -> BeatmapUserScore:
+        return await self._cached("beatmap_user_score", self._api.beatmap_user_score, beatmap_id, user_id,
+                                  mode=mode, mods=mods)
+
+    async def match(self, match_id: int, *, after_id: Optional[int] = None,
+                    before_id: Optional[int] = None) -> MatchResponse:
+        return await self._cached("match", self._api.match, match_id, after_id=after_id,
+                                  before_id=before_id)
+
+    async def seasonal_backgrounds(self) -> SeasonalBackgrounds:
+        return await self._cached("seasonal_backgrounds", self._api.seasonal_backgrounds)
+
+    def shutdown(self):
+        """
+        关闭线程池, 在应用关闭时调用
+        """
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+
+osu_api = AsyncOsuApi(settings.osu_api, OSU_API_MAX_WORKERS)
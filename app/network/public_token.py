@@ -1,15 +1,44 @@
+import asyncio
+import time
+import uuid
+from typing import Optional, Tuple
+
 from loguru import logger
 
 from app.config import settings
-from app.database.cache import get_redis_client
+from app.config.settings import PUBLIC_TOKEN_RENEW_MARGIN
+from app.database.cache import redis_cache
 from app.network.network import httpx_request
 
+_TOKEN_KEY = "public_token"
+_EXPIRES_AT_KEY = "public_token:expires_at"
+_LOCK_KEY = "public_token:lock"
+
+# 其他进程持有刷新锁时的等待方式
+_LOCK_TIMEOUT_MS = 15000
+_LOCK_POLL_INTERVAL = 0.1
+_LOCK_POLL_ATTEMPTS = 100
+
+# 续期失败后的重试间隔（秒）
+_RENEW_RETRY_INTERVAL = 30
+
 
 class PublicToken:
-    def __init__(self):
-        self.cache = get_redis_client()
+    """
+    osu! public token 管理
 
-    async def set_public_token(self):
+    同一进程内的并发刷新只会发出一次 OAuth 请求, 多个进程之间通过 Redis 锁协调;
+    后台任务会在 token 过期前 renew_margin 秒主动续期
+    """
+
+    def __init__(self, renew_margin: int):
+        self.cache = redis_cache
+        self._renew_margin = renew_margin
+        self._refreshing: Optional[asyncio.Task] = None
+        self._renew_task: Optional[asyncio.Task] = None
+        self._refresh_count = 0
+
+    async def _request_token(self) -> dict:
         client_id = settings.CLIENT_ID
         client_secret = settings.CLIENT_SECRET
 
@@ -32,21 +61,126 @@ class PublicToken:
                 logger.error(f"KeyError: Missing {key}")
                 raise KeyError(f"Missing {key}")
 
-        access_token = response_json["access_token"]
-        expires_in = response_json["expires_in"]
+        return response_json
+
+    async def _read_token(self) -> Tuple[Optional[str], float]:
+        token = await self.cache.get(_TOKEN_KEY)
+        expires_at = await self.cache.get(_EXPIRES_AT_KEY)
+        return (token.decode('utf-8') if token is not None else None,
+                float(expires_at) if expires_at is not None else 0.0)
+
+    def _is_fresh(self, token: Optional[str], expires_at: float, stale_token: Optional[str]) -> bool:
+        return token is not None and token != stale_token and expires_at - time.time() > self._renew_margin
+
+    async def _refresh(self, stale_token: Optional[str]) -> str:
+        lock_token = uuid.uuid4().hex
+        locked = False
+        for _ in range(_LOCK_POLL_ATTEMPTS):
+            token, expires_at = await self._read_token()
+            if self._is_fresh(token, expires_at, stale_token):
+                return token
+            if await self.cache.set(_LOCK_KEY, lock_token, px=_LOCK_TIMEOUT_MS, nx=True):
+                locked = True
+                break
+            await asyncio.sleep(_LOCK_POLL_INTERVAL)
+
         try:
-            self.cache.set("public_token", access_token, ex=expires_in)
-        except Exception as exc:
-            logger.error(f"Radis Cache error: {exc}")
+            # 拿到锁后再检查一次, 其他进程可能刚刚完成刷新
+            token, expires_at = await self._read_token()
+            if self._is_fresh(token, expires_at, stale_token):
+                return token
+
+            response_json = await self._request_token()
+            access_token = response_json["access_token"]
+            expires_in = response_json["expires_in"]
+            if self._renew_margin >= expires_in:
+                # 余量不小于有效期时, 新 token 一拿到就处在续期窗口内, 会不断重复刷新
+                logger.warning(f"Public token renew margin {self._renew_margin}s exceeds token lifetime "
+                               f"{expires_in}s, using {expires_in // 2}s instead")
+                self._renew_margin = expires_in // 2
+            await self.cache.set(_TOKEN_KEY, access_token, ex=expires_in)
+            await self.cache.set(_EXPIRES_AT_KEY, str(time.time() + expires_in), ex=expires_in)
+            self._refresh_count += 1
+            logger.info(f"Public token refreshed, expires in {expires_in}s")
+            return access_token
+        finally:
+            if locked and await self.cache.get(_LOCK_KEY) == lock_token.encode():
+                await self.cache.delete(_LOCK_KEY)
+
+    async def set_public_token(self, stale_token: Optional[str] = None) -> str:
+        """
+        刷新 public token, 并发调用会共享同一次刷新
+
+        :param stale_token: 已确认失效的 token, 传入后即使缓存中的 token 未过期也会刷新
+        :return: 新的 token
+        """
+        if self._refreshing is None or self._refreshing.done():
+            self._refreshing = asyncio.create_task(self._refresh(stale_token))
+        token = await asyncio.shield(self._refreshing)
+        if stale_token is not None and token == stale_token:
+            # 加入的刷新不是针对 stale_token 发起的, 可能直接返回了缓存中的同一个 token
+            if self._refreshing.done():
+                self._refreshing = asyncio.create_task(self._refresh(stale_token))
+            token = await asyncio.shield(self._refreshing)
+        return token
 
-    async def get_public_token(self):
-        token = self.cache.get("public_token")
+    async def get_public_token(self) -> Optional[str]:
+        token = await self.cache.get(_TOKEN_KEY)
         if token is None:
             try:
-                await self.set_public_token()
+                return await self.set_public_token()
             except Exception as exc:
                 logger.error(f"Failed to get public token: {exc}")
                 return None
-        if token is not None:
-            token = token.decode('utf-8')
-        return token
+        return token.decode('utf-8')
+
+    async def _renew_loop(self):
+        while True:
+            try:
+                token, expires_at = await self._read_token()
+                delay = expires_at - time.time() - self._renew_margin if token is not None else 0
+                if delay > 0:
+                    # 多等一秒, 确保醒来时 token 已进入续期窗口
+                    await asyncio.sleep(delay + 1)
+                await self.set_public_token()
+                # 两次续期之间至少间隔一段时间, 避免 token 过期时间异常时连续请求 OAuth
+                await asyncio.sleep(_RENEW_RETRY_INTERVAL)
+            except asyncio.CancelledError:
+                raise
+            except Exception as exc:
+                logger.error(f"Failed to renew public token: {exc}")
+                await asyncio.sleep(_RENEW_RETRY_INTERVAL)
+
+    def start_renewal(self):
+        """
+        启动后台续期任务, 在应用启动时调用
+        """
+        if self._renew_task is None or self._renew_task.done():
+            self._renew_task = asyncio.create_task(self._renew_loop())
+
+    async def stop_renewal(self):
+        """
+        停止后台续期任务, 在应用关闭时调用
+        """
+        if self._renew_task is not None:
+            self._renew_task.cancel()
+            try:
+                await self._renew_task
+            except asyncio.CancelledError:
+                pass
+            self._renew_task = None
+
+    def stats(self) -> dict:
+        """
+        获取 token 刷新统计
+
+        :return: 统计信息
+        """
+        return {
+            "refreshes": self._refresh_count,
+            "refreshing": self._refreshing is not None and not self._refreshing.done(),
+            "renewal_running": self._renew_task is not None and not self._renew_task.done(),
+        }
+
+
+public_token = PublicToken(PUBLIC_TOKEN_RENEW_MARGIN)
@@ -1,59 +1,52 @@
 import asyncio
-import re
 import random
-from io import BytesIO, TextIOWrapper
+import zipfile
+from io import BytesIO
 from pathlib import Path
-from typing import Union, List
+from typing import Union, List, Dict
 
+import httpx
 from fastapi import HTTPException, Response
+from PIL import Image
 from loguru import logger
 from ossapi import User, Score, Mod
-from ossapi.models import NonLegacyMod
-
-from app.config.settings import osu_api
-from app.network.network import get_first_response
-from app.osu_utils.file import cache_dir
-from app.osu_utils.pp import get_ss_pp_info
+from ossapi.models import NonLegacyMod, Beatmap, UserCompact
+
+from app.database.image_cache import image_cache
+from app.network.osu_api import osu_api
+from app.network.mirror import mirror_client
+from app.network.download import download_manager
+from app.osu_utils.file import run_file_io
+from app.osu_utils.osu_file import parse_osu_file, get_osu_file_info
+from app.osu_utils.pp import get_ss_pp_info_async
 from app.draw.beatmap import BeatmapImageStrategy, BeatmapSetImageStrategy
 
 
-async def get_content_from_urls(url_list: list, max_attempts: int = 5) -> BytesIO:
+def _is_image(response: httpx.Response) -> bool:
+    return 'image/' in response.headers.get('Content-Type', '').lower() and len(response.content) > 0
+
+
+async def get_content_from_urls(url_list: list) -> BytesIO:
     """
-    尝试从URL列表中获取内容，最多重试max_attempts次。
+    从多个镜像获取图片, 返回最先到达的有效图片。
     只有当响应的Content-Type为图片类型时才认为是成功的。
     """
-    for attempt in range(max_attempts):
-        try:
-            response = await get_first_response(url_list)
-            content_type = response.headers.get('Content-Type', '').lower()
-            if 'image/' in content_type:
-                content = await response.aread()
-                return BytesIO(content)
-            else:
-                logger.debug(f"Non-image content type received: {content_type}")
-        except Exception as e:
-            logger.error(f"Attempt {attempt + 1} of {max_attempts} failed: {e}")
-            await asyncio.sleep(1)  # 简单的退避策略
-
-    logger.error(f"Failed to download after {max_attempts} attempts")
-    return BytesIO()  # 返回一个空的BytesIO对象表示失败
+    try:
+        return BytesIO(await mirror_client.fetch(url_list, validate=_is_image))
+    except Exception as e:
+        logger.error(f"Failed to download image: {e}")
+        return BytesIO()  # 返回一个空的BytesIO对象表示失败
 
 
-async def get_map_bg(set_id: int, map_id: int = None, bg_name: str = None) -> bytes:
-    """
-    获取 beatmap 背景图。
-    """
-    file_path = cache_dir / "beatmap" / "osu_file" / f"{set_id}"
-    file_path.mkdir(parents=True, exist_ok=True)
+def _map_bg_key(set_id: int, bg_name: str = None) -> str:
     if bg_name:
         file_name = bg_name
     else:
         file_name = f"set.jpg"
-    file_full_path = file_path / file_name
+    return f"map_bg/{set_id}/{file_name}"
 
-    if file_full_path.exists():
-        return file_full_path.read_bytes()
 
+async def _download_map_bg(set_id: int, map_id: int = None, bg_name: str = None) -> bytes:
     # 尝试下载背景图
     try:
         if bg_name and map_id:
@@ -65,12 +58,31 @@ async def get_map_bg(set_id: int, map_id: int = None, bg_name: str = None) -> by
     except Exception as e:
         logger.warning(f"Failed to get beatmap background, trying to get seasonal background: {e}")
         file_content = await download_seasonal_bg()
-
-    with open(file_full_path, "wb") as f:
-        f.write(file_content.getvalue())
     return file_content.getvalue()
 
 
+async def get_map_bg(set_id: int, map_id: int = None, bg_name: str = None) -> bytes:
+    """
+    获取 beatmap 背景图。
+    """
+    return await download_manager.get(_map_bg_key(set_id, bg_name), lambda: _download_map_bg(set_id, map_id, bg_name))
+
+
+async def get_map_bg_path(set_id: int, map_id: int = None, bg_name: str = None) -> Path:
+    """
+    获取 beatmap 背景图在磁盘缓存中的路径, 文件名为内容的 sha256。
+    """
+    return await download_manager.get_path(_map_bg_key(set_id, bg_name),
+                                           lambda: _download_map_bg(set_id, map_id, bg_name))
+
+
+async def get_map_bg_image(set_id: int, map_id: int = None, bg_name: str = None) -> Image.Image:
+    """
+    获取解码后的 beatmap 背景图, 热门背景直接从内存返回。
+    """
+    return await image_cache.get(_map_bg_key(set_id, bg_name), lambda: get_map_bg(set_id, map_id, bg_name))
+
+
 async def download_map_bg(map_id: int, set_id: int = None, bg_name: str = None) -> BytesIO:
     """
     下载 beatmap 背景图。
@@ -97,7 +109,7 @@ async def download_seasonal_bg() -> BytesIO:
     """
     下载季节背景图。
     """
-    seasonal_bg = osu_api.seasonal_backgrounds()
+    seasonal_bg = await osu_api.seasonal_backgrounds()
     url_list = [bg.url for bg in seasonal_bg.backgrounds]
     return await get_content_from_urls(url_list)
 
@@ -109,45 +121,26 @@ async def get_osu_file_path(beatmap_set_id: int, beatmap_id: int) -> Path:
     :param beatmap_id:
     :return:
     """
-    path = cache_dir / "beatmap" / "osu_file" / f"{beatmap_set_id}"
-    if not path.exists():
-        path.mkdir(parents=True, exist_ok=True)
-    file_name = f"{beatmap_id}.osu"
+    cache_key = f"osu_file/{beatmap_id}"
     url = [f"https://osu.ppy.sh/osu/{beatmap_id}", f"https://api.osu.direct/osu/{beatmap_id}"]
-    # 如果文件存在，直接读取文件
-    if (path / file_name).exists():
-        return path / file_name
-    # 如果文件不存在，下载文件
-    try:
+
+    async def download() -> bytes:
         logger.info(f"Downloading osu file for {beatmap_id}")
-        response = await get_first_response(url)
-        with open(path / file_name, "wb") as f:
-            f.write(response.content)
+        return await mirror_client.fetch(url)
 
+    try:
+        return await download_manager.get_path(cache_key, download)
     except Exception as e:
         logger.error(f"Failed to get osu file: {e}")
         raise e
 
-    return path / file_name
-
 
 def get_bg_filename(file: Union[bytes, Path]) -> str:
-    # 读取文件内容到text字符串
-    if isinstance(file, bytes):
-        text = TextIOWrapper(BytesIO(file), "utf-8").read()
-    else:
-        with open(file, "r", encoding="utf-8") as f:
-            text = f.read()
-
-    # 使用正则表达式解析文本，找到所有匹配
-    for match in re.finditer(r"\d,\d,\"(.+)\"", text):
-        bg_candidate = match.group(1).strip()
-        # 检查文件后缀是否为 jpg 或 png
-        if bg_candidate.endswith('.jpg') or bg_candidate.endswith('.png') or bg_candidate.endswith('.jpeg'):
-            return bg_candidate
+    # 只解析到 [Events], 缓存中的文件按路径缓存解析结果
+    info = parse_osu_file(file) if isinstance(file, bytes) else get_osu_file_info(file)
 
-    # 如果没有找到任何有效的匹配项，则返回默认文件名
-    return "mapbg.png"
+    # 如果没有找到背景图，则返回默认文件名
+    return info.background or "mapbg.png"
 
 
 def calculate_circle_size(circle_size: float, mod: List[NonLegacyMod]) -> float:
@@ -223,27 +216,148 @@ async def get_info_img(beatmap_id: int, beatmapset_id: int, theme: str):
     if not beatmap_id and not beatmapset_id:
         raise HTTPException(status_code=400, detail="Bad request")
     if beatmap_id:
-        beatmap_info = osu_api.beatmap(beatmap_id=beatmap_id)
+        beatmap_info = await osu_api.beatmap(beatmap_id=beatmap_id)
         if not beatmap_info:
             raise HTTPException(status_code=400, detail="Bad request")
-        osu_file_path = await get_osu_file_path(beatmap_info.beatmapset().id, beatmap_info.id)
-        ss_pp_info = get_ss_pp_info(osu_file_path, beatmap_info.ruleset_id, 0)
-        mapper_info = osu_api.user(beatmap_info.beatmapset().user_id)
-        bg_name = get_bg_filename(osu_file_path)
-        map_bg = await get_map_bg(set_id=beatmap_info.beatmapset().id, map_id=beatmap_info.id, bg_name=bg_name)
-        try:
-            illustration = BeatmapImageStrategy(beatmap_info, ss_pp_info, mapper_info, bg_name, map_bg)
-            image = await illustration.apply_theme(theme)
-        except Exception as e:
-            logger.error(f"An error occurred while generating beatmap image: {e}")
-            raise HTTPException(status_code=500, detail=f"Internal server error: {e}")
+        mapper_info = await osu_api.user(beatmap_info.beatmapset().user_id)
+        image = await draw_beatmap_img(beatmap_info, mapper_info, theme)
     else:
-        beatmap_set_info = osu_api.beatmapset(beatmapset_id=beatmapset_id)
+        beatmap_set_info = await osu_api.beatmapset(beatmapset_id=beatmapset_id)
         try:
             illustration = BeatmapSetImageStrategy(beatmap_set_info)
             image = await illustration.apply_theme(theme)
+        except HTTPException:
+            raise
         except Exception as e:
             logger.error(f"An error occurred while generating beatmap image: {e}")
             raise HTTPException(status_code=500, detail=f"Internal server error: {e}")
 
     return Response(content=image, media_type="image/jpeg")
+
+
+async def draw_beatmap_img(beatmap_info: Beatmap, mapper_info: Union[User, UserCompact], theme: str) -> bytes:
+    """
+    绘制单个 beatmap 的信息图片
+    :param beatmap_info: 需要包含 beatmapset, 否则会额外请求一次 API
+    :param mapper_info:
+    :param theme:
+    :return: 图片内容
+    """
+    beatmapset_info = beatmap_info.beatmapset()
+    osu_file_path = await get_osu_file_path(beatmapset_info.id, beatmap_info.id)
+    ss_pp_info = await get_ss_pp_info_async(osu_file_path, beatmap_info.ruleset_id, 0)
+    bg_name = get_bg_filename(osu_file_path)
+    map_bg = await get_map_bg_image(set_id=beatmapset_info.id, map_id=beatmap_info.id, bg_name=bg_name)
+    try:
+        illustration = BeatmapImageStrategy(beatmap_info, ss_pp_info, mapper_info, bg_name, map_bg)
+        return await illustration.apply_theme(theme)
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"An error occurred while generating beatmap image: {e}")
+        raise HTTPException(status_code=500, detail=f"Internal server error: {e}")
+
+
+# osu! API 批量接口每次最多接受 50 个 id
+_API_BATCH_SIZE = 50
+# 批量绘图时同时处理的 beatmap 数量, 避免一次占满 pp 计算进程池的队列
+_DRAW_CONCURRENCY = 4
+
+
+def _chunks(ids: List[int]) -> List[List[int]]:
+    # 去重并保持顺序
+    ids = list(dict.fromkeys(ids))
+    return [ids[i:i + _API_BATCH_SIZE] for i in range(0, len(ids), _API_BATCH_SIZE)]
+
+
+async def get_beatmaps(beatmap_ids: List[int]) -> Dict[int, Beatmap]:
+    """
+    批量获取 beatmap, 返回结果包含 beatmapset
+    :param beatmap_ids:
+    :return: 以 beatmap id 为键, 不存在的 beatmap 不会出现在结果中
+    """
+    results = await asyncio.gather(*[osu_api.beatmaps(chunk) for chunk in _chunks(beatmap_ids)])
+    return {beatmap.id: beatmap for chunk in results for beatmap in chunk}
+
+
+async def get_users(user_ids: List[int]) -> Dict[int, UserCompact]:
+    """
+    批量获取用户
+    :param user_ids:
+    :return: 以用户 id 为键
+    """
+    results = await asyncio.gather(*[osu_api.users(chunk) for chunk in _chunks(user_ids)])
+    return {user.id: user for chunk in results for user in chunk}
+
+
+def _zip_files(files: Dict[str, bytes]) -> bytes:
+    byt = BytesIO()
+    # 图片已经压缩过, 直接存储
+    with zipfile.ZipFile(byt, "w", zipfile.ZIP_STORED) as archive:
+        for name, content in files.items():
+            archive.writestr(name, content)
+    return byt.getvalue()
+
+
+async def _batch_response(beatmap_ids: List[int], beatmaps: Dict[int, Beatmap], draw, archive_name: str) -> Response:
+    semaphore = asyncio.Semaphore(_DRAW_CONCURRENCY)
+
+    async def run(beatmap: Beatmap):
+        async with semaphore:
+            return await draw(beatmap)
+
+    results = await asyncio.gather(*[run(beatmap) for beatmap in beatmaps.values()], return_exceptions=True)
+    files = {}
+    failed = [beatmap_id for beatmap_id in dict.fromkeys(beatmap_ids) if beatmap_id not in beatmaps]
+    for beatmap, result in zip(beatmaps.values(), results):
+        if isinstance(result, BaseException):
+            logger.error(f"Failed to process beatmap {beatmap.id}: {result}")
+            failed.append(beatmap.id)
+        else:
+            name, content = result
+            files[name] = content
+    if not files:
+        raise HTTPException(status_code=404, detail="No beatmap found")
+
+    content = await run_file_io(_zip_files, files)
+    headers = {"Content-Disposition": f'attachment; filename="{archive_name}"'}
+    if failed:
+        headers["X-Failed-Beatmaps"] = ",".join(str(beatmap_id) for beatmap_id in failed)
+    return Response(content=content, media_type="application/zip", headers=headers)
+
+
+async def get_info_img_batch(beatmap_ids: List[int], theme: str) -> Response:
+    """
+    批量获取 beatmap 信息图片, beatmap 与 mapper 各只请求一次批量接口
+    :param beatmap_ids:
+    :param theme:
+    :return: zip 压缩包, 文件名为 {beatmap_id}.png, 失败的 id 放在 X-Failed-Beatmaps 响应头中
+    """
+    beatmaps = await get_beatmaps(beatmap_ids)
+    mappers = await get_users([beatmap.beatmapset().user_id for beatmap in beatmaps.values()])
+
+    async def draw(beatmap: Beatmap):
+        mapper_info = mappers.get(beatmap.beatmapset().user_id)
+        if mapper_info is None:
+            raise ValueError(f"Mapper {beatmap.beatmapset().user_id} not found")
+        return f"{beatmap.id}.png", await draw_beatmap_img(beatmap, mapper_info, theme)
+
+    return await _batch_response(beatmap_ids, beatmaps, draw, "beatmaps.zip")
+
+
+async def get_cover_batch(beatmap_ids: List[int]) -> Response:
+    """
+    批量获取 beatmap 背景图
+    :param beatmap_ids:
+    :return: zip 压缩包, 文件名为 {beatmap_id} 加背景图原后缀, 失败的 id 放在 X-Failed-Beatmaps 响应头中
+    """
+    beatmaps = await get_beatmaps(beatmap_ids)
+
+    async def draw(beatmap: Beatmap):
+        set_id = beatmap.beatmapset().id
+        osu_file_path = await get_osu_file_path(set_id, beatmap.id)
+        bg_name = get_bg_filename(osu_file_path)
+        content = await get_map_bg(map_id=beatmap.id, set_id=set_id, bg_name=bg_name)
+        return f"{beatmap.id}{Path(bg_name).suffix.lower() or '.jpg'}", content
+
+    return await _batch_response(beatmap_ids, beatmaps, draw, "covers.zip")
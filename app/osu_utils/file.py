@@ -1,4 +1,74 @@
+import asyncio
+import functools
+import mmap
+import os
+import uuid
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
+from typing import Any, Callable
+
+from app.config.settings import FILE_IO_MAX_WORKERS, FILE_MMAP_THRESHOLD
 
 cache_dir = Path(__file__).parent.parent / 'cache'
 log_dir = Path(__file__).parent.parent.parent / 'logs'
+
+# 缓存目录可能挂载在较慢的存储上, 文件读写统一放到独立线程池中, 不占用事件循环
+_file_io_executor = ThreadPoolExecutor(max_workers=FILE_IO_MAX_WORKERS, thread_name_prefix="file-io")
+
+
+async def run_file_io(func: Callable, *args, **kwargs) -> Any:
+    """
+    在文件 I/O 线程池中执行同步函数
+    :param func:
+    :return: func 的返回值
+    """
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_file_io_executor, functools.partial(func, *args, **kwargs))
+
+
+def read_file(path: Path) -> bytes:
+    """
+    读取文件, 大于 FILE_MMAP_THRESHOLD 的文件通过内存映射读取
+    :param path:
+    :return:
+    """
+    with open(path, "rb") as f:
+        if FILE_MMAP_THRESHOLD:
+            size = os.fstat(f.fileno()).st_size
+            if size >= FILE_MMAP_THRESHOLD:
+                with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+                    return mapped[:]
+        return f.read()
+
+
+def write_file(path: Path, data: bytes):
+    """
+    原子写入文件, 先写临时文件再 rename, 读取方不会看到写了一半的文件
+    :param path:
+    :param data:
+    :return:
+    """
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = path.with_name(f".{path.name}.{uuid.uuid4().hex}.tmp")
+    with open(tmp_path, "wb") as f:
+        f.write(data)
+    os.replace(tmp_path, path)
+
+
+async def read_bytes(path: Path) -> bytes:
+    return await run_file_io(read_file, path)
+
+
+async def write_bytes(path: Path, data: bytes):
+    await run_file_io(write_file, path, data)
+
+
+async def write_text(path: Path, text: str, encoding: str = "utf-8"):
+    await run_file_io(write_file, path, text.encode(encoding))
+
+
+def shutdown_file_io():
+    """
+    关闭文件 I/O 线程池, 在应用关闭时调用
+    """
+    _file_io_executor.shutdown(wait=True)
@@ -7,18 +7,18 @@ from ossapi import MatchGame
 
 from ossapi.models import MatchEventType, UserCompact
 
-from app.config.settings import osu_api
+from app.network.osu_api import osu_api
 from app.draw.multiplayer import MatchHistoryImageStrategy, RatingImageStrategy
 
 
 async def generate_match_history_img(mp_id: int, theme: str = "default"):
-    match_info = osu_api.match(mp_id)
+    match_info = await osu_api.match(mp_id)
     if not match_info:
         raise HTTPException(status_code=404, detail="No match found")
 
     while match_info.events[0].detail.type != MatchEventType.MATCH_CREATED:
         logger.debug(f"Match Created not found, trying to get previous events")
-        before_match_info = osu_api.match(match_id=mp_id, before_id=match_info.events[0].id)
+        before_match_info = await osu_api.match(match_id=mp_id, before_id=match_info.events[0].id)
         if not before_match_info:
             raise HTTPException(status_code=404, detail="No match found")
         match_info.events = before_match_info.events + match_info.events
@@ -26,6 +26,8 @@ async def generate_match_history_img(mp_id: int, theme: str = "default"):
     try:
         illustration = MatchHistoryImageStrategy(match_info)
         image = await illustration.apply_theme(theme)
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Error when drawing image: {e}")
         raise HTTPException(status_code=500, detail=f"Internal server error: {e}")
@@ -34,13 +36,13 @@ async def generate_match_history_img(mp_id: int, theme: str = "default"):
 
 
 async def generate_rating_img(mp_id: int, algorithm: str, theme: str = "default"):
-    match_info = osu_api.match(mp_id)
+    match_info = await osu_api.match(mp_id)
     if not match_info:
         raise HTTPException(status_code=404, detail="No match found")
 
     while match_info.events[0].detail.type != MatchEventType.MATCH_CREATED:
         logger.debug(f"Match Created not found, trying to get previous events")
-        before_match_info = osu_api.match(match_id=mp_id, before_id=match_info.events[0].id)
+        before_match_info = await osu_api.match(match_id=mp_id, before_id=match_info.events[0].id)
         if not before_match_info:
             raise HTTPException(status_code=404, detail="No match found")
         match_info.events = before_match_info.events + match_info.events
@@ -48,6 +50,8 @@ async def generate_rating_img(mp_id: int, algorithm: str, theme: str = "default"
     try:
         illustration = RatingImageStrategy(match_info, algorithm)
         image = await illustration.apply_theme(theme)
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Error when drawing image: {e}")
         raise HTTPException(status_code=500, detail=f"Internal server error: {e}")
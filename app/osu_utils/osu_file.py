@@ -0,0 +1,107 @@
+from io import BytesIO, TextIOWrapper
+from pathlib import Path
+from typing import Dict, IO, Optional, Union
+
+from app.database.lru import LRUCache
+
+# [Events] 之后是时间轴与物件, 解析到这里就可以停止
+_KEY_VALUE_SECTIONS = {"General", "Metadata", "Difficulty"}
+_IMAGE_SUFFIXES = (".jpg", ".jpeg", ".png")
+_INFO_CACHE_MAX_BYTES = 8 * 1024 * 1024
+
+
+class OsuFileInfo:
+    """
+    .osu 文件头部信息, 包含 [General]、[Metadata]、[Difficulty] 与背景图文件名
+    """
+
+    def __init__(self):
+        self.version: Optional[int] = None
+        self.general: Dict[str, str] = {}
+        self.metadata: Dict[str, str] = {}
+        self.difficulty: Dict[str, float] = {}
+        self.background: Optional[str] = None
+
+    def sizeof(self) -> int:
+        # 粗略估算, 只用于缓存预算
+        strings = [*self.general.items(), *self.metadata.items()]
+        return 512 + sum(len(key) + len(value) for key, value in strings) + 64 * len(self.difficulty)
+
+
+def _parse_background(line: str) -> Optional[str]:
+    # 背景图事件格式为 0,0,"文件名",x偏移,y偏移, 文件名可能没有引号
+    parts = line.split(",", 3)
+    if len(parts) < 3 or parts[0].strip() not in {"0", "Background"}:
+        return None
+    filename = parts[2].strip().strip('"').strip()
+    if filename.lower().endswith(_IMAGE_SUFFIXES):
+        return filename
+    return None
+
+
+def parse_osu_stream(stream: IO[str]) -> OsuFileInfo:
+    """
+    逐行解析 .osu 文件, 读完 [Events] 即停止, 不读取物件部分
+    :param stream: 文本流
+    :return: 文件头部信息
+    """
+    info = OsuFileInfo()
+    section = None
+    for line in stream:
+        line = line.strip()
+        if not line or line.startswith("//"):
+            continue
+        if line.startswith("[") and line.endswith("]"):
+            if section == "Events":
+                break
+            section = line[1:-1]
+            continue
+        if section is None:
+            version = line[len("osu file format v"):]
+            if line.startswith("osu file format v") and version.isdigit():
+                info.version = int(version)
+        elif section in _KEY_VALUE_SECTIONS:
+            key, sep, value = line.partition(":")
+            if not sep:
+                continue
+            key, value = key.strip(), value.strip()
+            if section == "Difficulty":
+                try:
+                    info.difficulty[key] = float(value)
+                except ValueError:
+                    pass
+            elif section == "Metadata":
+                info.metadata[key] = value
+            else:
+                info.general[key] = value
+        elif section == "Events" and info.background is None:
+            info.background = _parse_background(line)
+    return info
+
+
+def parse_osu_file(file: Union[bytes, Path]) -> OsuFileInfo:
+    """
+    解析 .osu 文件头部信息
+    :param file: 文件内容或路径
+    :return: 文件头部信息
+    """
+    if isinstance(file, bytes):
+        return parse_osu_stream(TextIOWrapper(BytesIO(file), "utf-8-sig", errors="replace"))
+    with open(file, "r", encoding="utf-8-sig", errors="replace") as f:
+        return parse_osu_stream(f)
+
+
+_info_cache = LRUCache(_INFO_CACHE_MAX_BYTES)
+
+
+def get_osu_file_info(path: Path) -> OsuFileInfo:
+    """
+    获取 .osu 文件头部信息, 结果按文件缓存
+    :param path: 磁盘缓存中的文件路径, 文件名为内容摘要, 谱面更新后自然对应新的缓存
+    :return: 文件头部信息
+    """
+    return _info_cache.get_or_set(path.name, lambda: parse_osu_file(path), OsuFileInfo.sizeof)
+
+
+def get_osu_file_info_stats() -> dict:
+    return _info_cache.stats()
@@ -1,14 +1,173 @@
 import math
+from functools import cached_property
+from types import SimpleNamespace
 import numpy as np
 from pathlib import Path
+from typing import Any, Union
 
 from ossapi import Score
-from rosu_pp_py import PerformanceAttributes, Beatmap, Performance, GameMode
+from rosu_pp_py import (PerformanceAttributes, Beatmap, Performance, GameMode, Difficulty, DifficultyAttributes,
+                        ScoreState)
+
+from app.config.settings import PP_BEATMAP_CACHE_MAX_BYTES, PP_DIFFICULTY_CACHE_MAX_BYTES
+from app.database.lru import LRUCache, merge_lru_stats
+from app.osu_utils.pp_pool import pp_pool
+
+# 解析后的 Beatmap 占用内存约为 .osu 文件大小的数倍, 按此估算缓存大小
+_BEATMAP_SIZE_FACTOR = 4
+_DIFFICULTY_SIZE = 1024
+
+# PPCalculator 在进程池中计算时用到的成绩字段
+_STATISTICS_FIELDS = ("good", "perfect", "miss", "meh", "ok", "great", "small_tick_hit", "large_tick_hit",
+                      "slider_tail_hit")
+
+# bp 只统计前 100 个成绩, 第 i 个成绩的权重为 0.95^i
+_BP_LIMIT = 100
+_PP_WEIGHTS = 0.95 ** np.arange(_BP_LIMIT)
+
+_beatmap_cache = LRUCache(PP_BEATMAP_CACHE_MAX_BYTES)
+_difficulty_cache = LRUCache(PP_DIFFICULTY_CACHE_MAX_BYTES)
+
+
+def get_game_mode(ruleset_id: int) -> GameMode:
+    """
+    根据 ruleset_id 获取 rosu 的 GameMode
+    :param ruleset_id:
+    :return:
+    """
+    if ruleset_id in {0, 4, 8}:
+        return GameMode.Osu
+    elif ruleset_id in {1, 5}:
+        return GameMode.Taiko
+    elif ruleset_id in {2, 6}:
+        return GameMode.Catch
+    else:
+        return GameMode.Mania
+
+
+def _cache_key(osu_file_path: Path, mode: GameMode, mods: Union[list[str], int]) -> tuple:
+    # .osu 文件在磁盘缓存中以内容摘要命名, 谱面更新后 key 也会随之变化
+    mods_key = tuple(sorted(mods)) if isinstance(mods, list) else mods
+    return Path(osu_file_path).stem, str(mode), mods_key
+
+
+def get_beatmap(osu_file_path: Path, mode: GameMode, mods: Union[list[str], int]) -> Beatmap:
+    """
+    获取解析并转谱后的 Beatmap, 结果按 (beatmap_id, mode, mods) 缓存
+    :param osu_file_path:
+    :param mode:
+    :param mods:
+    :return:
+    """
+    def parse() -> Beatmap:
+        beatmap = Beatmap(path=str(osu_file_path))
+        beatmap.convert(mode, mods=mods)
+        return beatmap
+
+    return _beatmap_cache.get_or_set(
+        _cache_key(osu_file_path, mode, mods), parse,
+        lambda _: Path(osu_file_path).stat().st_size * _BEATMAP_SIZE_FACTOR
+    )
+
+
+def get_difficulty(osu_file_path: Path, mode: GameMode, mods: Union[list[str], int]) -> DifficultyAttributes:
+    """
+    获取难度属性, 结果按 (beatmap_id, mode, mods) 缓存
+    :param osu_file_path:
+    :param mode:
+    :param mods:
+    :return:
+    """
+    return _difficulty_cache.get_or_set(
+        _cache_key(osu_file_path, mode, mods),
+        lambda: Difficulty(mods=mods).calculate(get_beatmap(osu_file_path, mode, mods)),
+        lambda _: _DIFFICULTY_SIZE
+    )
+
+
+def clear_pp_cache():
+    """
+    清空 pp 缓存, 进程池启用时缓存位于子进程中, 通过换用新的子进程清空
+    """
+    _beatmap_cache.clear()
+    _difficulty_cache.clear()
+    pp_pool.recycle()
+
+
+def get_local_pp_cache_stats() -> dict:
+    return {"beatmap": _beatmap_cache.stats(), "difficulty": _difficulty_cache.stats()}
+
+
+def get_pp_cache_stats() -> dict:
+    """
+    获取 pp 缓存统计, 进程池启用时汇总各子进程的缓存
+
+    :return: 统计信息, workers 为已返回统计的子进程数
+    """
+    if not pp_pool.enabled:
+        return get_local_pp_cache_stats()
+    worker_stats = pp_pool.worker_stats()
+    return {
+        "workers": len(worker_stats),
+        "beatmap": merge_lru_stats([stats["beatmap"] for stats in worker_stats]),
+        "difficulty": merge_lru_stats([stats["difficulty"] for stats in worker_stats]),
+    }
+
+
+def snapshot_attributes(attributes: Any) -> SimpleNamespace:
+    """
+    把 rosu 的计算结果转换为可以 pickle 的 SimpleNamespace, 属性名保持不变
+    :param attributes: PerformanceAttributes 或 DifficultyAttributes
+    :return:
+    """
+    values = {}
+    for name in dir(attributes):
+        if name.startswith("_"):
+            continue
+        value = getattr(attributes, name)
+        if callable(value):
+            continue
+        if isinstance(value, GameMode):
+            value = str(value)
+        elif isinstance(value, (DifficultyAttributes, ScoreState)):
+            value = snapshot_attributes(value)
+        values[name] = value
+    return SimpleNamespace(**values)
+
+
+def _score_snapshot(score: Score) -> SimpleNamespace:
+    statistics = score.statistics
+    return SimpleNamespace(
+        mods=[SimpleNamespace(acronym=item.acronym) for item in score.mods],
+        ruleset_id=score.ruleset_id,
+        accuracy=score.accuracy,
+        max_combo=score.max_combo,
+        statistics=SimpleNamespace(**{name: getattr(statistics, name) for name in _STATISTICS_FIELDS}),
+    )
+
+
+def _score_performance(score: Score, mods: list[str]) -> Performance:
+    return Performance(
+        accuracy=score.accuracy * 100,
+        n_katu=score.statistics.good if score.statistics.good else 0,
+        n_geki=score.statistics.perfect if score.statistics.perfect else 0,
+        combo=score.max_combo,
+        misses=score.statistics.miss if score.statistics.miss else 0,
+        n50=score.statistics.meh if score.statistics.meh else 0,
+        n100=score.statistics.ok if score.statistics.ok else 0,
+        n300=score.statistics.great if score.statistics.great else 0,
+        small_tick_hits=score.statistics.small_tick_hit,
+        large_tick_hits=score.statistics.large_tick_hit,
+        slider_end_hits=score.statistics.slider_tail_hit,
+        mods=mods,
+    )
 
 
 class PPCalculator:
     """
     PP计算器
+
+    难度、当前 pp、if fc pp 和 ss pp 均在首次访问时计算, 同一实例内只计算一次
     """
 
     def __init__(self, score: Score, osu_file_path: Path):
@@ -19,93 +178,82 @@ class PPCalculator:
         self.score = score
         self.osu_file_path = osu_file_path
 
-    def pp_info(self) -> PerformanceAttributes:
+    @cached_property
+    def mods(self) -> list[str]:
+        return [item.acronym for item in self.score.mods]
+
+    @cached_property
+    def difficulty(self) -> DifficultyAttributes:
         """
-        计算pp
-        :return:
+        难度属性
         """
-        beatmap = Beatmap(path=str(self.osu_file_path))
-        mods = [item.acronym for item in self.score.mods]
-        if self.score.ruleset_id in {0, 4, 8}:
-            mode = GameMode.Osu
-        elif self.score.ruleset_id in {1, 5}:
-            mode = GameMode.Taiko
-        elif self.score.ruleset_id in {2, 6}:
-            mode = GameMode.Catch
-        else:
-            mode = GameMode.Mania
-        beatmap.convert(mode, mods=mods)
+        return get_difficulty(self.osu_file_path, get_game_mode(self.score.ruleset_id), self.mods)
 
+    @cached_property
+    def performance(self) -> PerformanceAttributes:
+        """
+        当前成绩的 pp
+        """
+        return _score_performance(self.score, self.mods).calculate(self.difficulty)
+
+    @cached_property
+    def if_fc_performance(self) -> PerformanceAttributes:
+        """
+        把 miss 当作 300 后的 if fc pp
+        """
         c = Performance(
             accuracy=self.score.accuracy * 100,
             n_katu=self.score.statistics.good if self.score.statistics.good else 0,
             n_geki=self.score.statistics.perfect if self.score.statistics.perfect else 0,
-            combo=self.score.max_combo,
-            misses=self.score.statistics.miss if self.score.statistics.miss else 0,
             n50=self.score.statistics.meh if self.score.statistics.meh else 0,
             n100=self.score.statistics.ok if self.score.statistics.ok else 0,
-            n300=self.score.statistics.great if self.score.statistics.great else 0,
-            small_tick_hits=self.score.statistics.small_tick_hit,
-            large_tick_hits=self.score.statistics.large_tick_hit,
-            slider_end_hits=self.score.statistics.slider_tail_hit,
-            mods=mods,
+            n300=self.score.statistics.great + (self.score.statistics.miss if self.score.statistics.miss else 0),
+            mods=self.mods,
         )
+        return c.calculate(self.difficulty)
+
+    @cached_property
+    def ss_performance(self) -> PerformanceAttributes:
+        """
+        ss pp
+        """
+        c = Performance(
+            accuracy=100,
+            mods=self.mods,
+        )
+        return c.calculate(self.difficulty)
+
+    async def precompute(self):
+        """
+        在进程池中计算全部结果并写入缓存属性, 之后的访问不再占用事件循环
+        """
+        if "ss_performance" in self.__dict__:
+            return
+        self.__dict__.update(await pp_pool.run(_precompute_score, _score_snapshot(self.score), self.osu_file_path))
 
-        return c.calculate(beatmap)
+    def pp_info(self) -> PerformanceAttributes:
+        """
+        计算pp
+        :return:
+        """
+        return self.performance
 
     def if_pp_ss_pp_info(self) -> tuple[float, float] | tuple[str, str]:
         """
         获取 if fc pp 和 ss pp
         :return: if pp 和 ss pp
         """
-        beatmap = Beatmap(path=str(self.osu_file_path))
-        mods = [item.acronym for item in self.score.mods]
-        if self.score.ruleset_id in {0, 4, 8}:
-            mode = GameMode.Osu
-        elif self.score.ruleset_id in {1, 5}:
-            mode = GameMode.Taiko
-        elif self.score.ruleset_id in {2, 6}:
-            mode = GameMode.Catch
-        else:
-            mode = GameMode.Mania
-        beatmap.convert(mode, mods=mods)
-        c = Performance(
-            accuracy=self.score.accuracy * 100,
-            n_katu=self.score.statistics.good if self.score.statistics.good else 0,
-            n_geki=self.score.statistics.perfect if self.score.statistics.perfect else 0,
-            n50=self.score.statistics.meh if self.score.statistics.meh else 0,
-            n100=self.score.statistics.ok if self.score.statistics.ok else 0,
-            n300=self.score.statistics.great + (self.score.statistics.miss if self.score.statistics.miss else 0),
-            mods=mods,
-        )
-        if_pp = c.calculate(beatmap).pp
-        c = Performance(accuracy=100, mods=mods)
-        ss_pp = c.calculate(beatmap).pp
+        if_pp = self.if_fc_performance.pp
         if math.isnan(if_pp):
             return "nan", "nan"
-        return if_pp, ss_pp
+        return if_pp, self.ss_performance.pp
 
     def ss_pp_info(self) -> PerformanceAttributes:
         """
         获取ss pp
         :return: ss pp
         """
-        beatmap = Beatmap(path=str(self.osu_file_path))
-        mods = [item.acronym for item in self.score.mods]
-        if self.score.ruleset_id in {0, 4, 8}:
-            mode = GameMode.Osu
-        elif self.score.ruleset_id in {1, 5}:
-            mode = GameMode.Taiko
-        elif self.score.ruleset_id in {2, 6}:
-            mode = GameMode.Catch
-        else:
-            mode = GameMode.Mania
-        beatmap.convert(mode, mods=mods)
-        c = Performance(
-            accuracy=100,
-            mods=mods,
-        )
-        return c.calculate(beatmap)
+        return self.ss_performance
 
 
 def get_ss_pp_info(osu_file_path: Path, ruleset_id: int, mods: int) -> PerformanceAttributes:
@@ -116,78 +264,162 @@ def get_ss_pp_info(osu_file_path: Path, ruleset_id: int, mods: int) -> Performan
     :param mods:
     :return:
     """
-    beatmap = Beatmap(path=str(osu_file_path))
-    if ruleset_id in {0, 4, 8}:
-        mode = GameMode.Osu
-    elif ruleset_id in {1, 5}:
-        mode = GameMode.Taiko
-    elif ruleset_id in {2, 6}:
-        mode = GameMode.Catch
-    else:
-        mode = GameMode.Mania
-    beatmap.convert(mode, mods=mods)
+    difficulty = get_difficulty(osu_file_path, get_game_mode(ruleset_id), mods)
     c = Performance(
         accuracy=100,
         mods=mods,
     )
-    return c.calculate(beatmap)
+    return c.calculate(difficulty)
 
 
-def find_optimal_new_pp(current_pp_list: list[float], desired_pp_increase: float) -> tuple[float, int]:
+def _precompute_score(score: SimpleNamespace, osu_file_path: Path) -> dict:
+    calculator = PPCalculator(score, osu_file_path)
+    return {
+        "difficulty": snapshot_attributes(calculator.difficulty),
+        "performance": snapshot_attributes(calculator.performance),
+        "if_fc_performance": snapshot_attributes(calculator.if_fc_performance),
+        "ss_performance": snapshot_attributes(calculator.ss_performance),
+    }
+
+
+def _ss_pp_info_snapshot(osu_file_path: Path, ruleset_id: int, mods: Union[list[str], int]) -> SimpleNamespace:
+    return snapshot_attributes(get_ss_pp_info(osu_file_path, ruleset_id, mods))
+
+
+async def get_ss_pp_info_async(osu_file_path: Path, ruleset_id: int,
+                               mods: Union[list[str], int]) -> Union[PerformanceAttributes, SimpleNamespace]:
     """
-    Find the optimal new PP to achieve a desired PP increase given a list of current PP values.
+    在进程池中获取ss pp
+    :param osu_file_path:
+    :param ruleset_id:
+    :param mods:
+    :return: 与 PerformanceAttributes 属性相同的快照
+    """
+    return await pp_pool.run(_ss_pp_info_snapshot, osu_file_path, ruleset_id, mods)
 
-    :param current_pp_list: List of current PP values (list of floats)
-    :param desired_pp_increase: Desired increase in total PP (float)
-    :return: Tuple of the optimal new PP and the position at which it will be placed
+
+def calculate_pp_batch(scores: list[tuple[Score, Path]]) -> list[PerformanceAttributes]:
+    """
+    批量计算成绩的 pp, 同一谱面同一 mod 组合的成绩只计算一次难度
+    :param scores: (成绩, osu 文件路径) 列表
+    :return: 与输入顺序一致的 pp 结果
     """
+    groups: dict[tuple, list[int]] = {}
+    for index, (score, osu_file_path) in enumerate(scores):
+        mods = [item.acronym for item in score.mods]
+        key = _cache_key(osu_file_path, get_game_mode(score.ruleset_id), mods)
+        groups.setdefault(key, []).append(index)
 
-    def calculate_total_pp(pp_list: list[float]) -> float:
-        """
-        计算 osu! 的总 PP。
+    results: list[PerformanceAttributes] = [None] * len(scores)
+    for indexes in groups.values():
+        first_score, osu_file_path = scores[indexes[0]]
+        mods = [item.acronym for item in first_score.mods]
+        difficulty = get_difficulty(osu_file_path, get_game_mode(first_score.ruleset_id), mods)
+        for index in indexes:
+            results[index] = _score_performance(scores[index][0], mods).calculate(difficulty)
+    return results
 
-        参数:
-        pp_list (list[float]): 一个包含每个分数 PP 的列表。
 
-        返回:
-        float: 总 PP 值。
-        """
-        weights = np.array([0.95 ** i for i in range(len(pp_list))], dtype=float)
-        total_performance_point = np.sum(np.array(pp_list, dtype=float) * weights)
-        return float(total_performance_point)
+def calculate_pp_by_accuracy(osu_file_path: Path, ruleset_id: int, mods: Union[list[str], int],
+                             accuracy_list: list[float]) -> list[PerformanceAttributes]:
+    """
+    计算同一谱面在不同准确率下的 pp, 难度只计算一次
+    :param osu_file_path:
+    :param ruleset_id:
+    :param mods:
+    :param accuracy_list: 准确率列表, 单位为百分比
+    :return: 与 accuracy_list 顺序一致的 pp 结果
+    """
+    difficulty = get_difficulty(osu_file_path, get_game_mode(ruleset_id), mods)
+    return [Performance(accuracy=accuracy, mods=mods).calculate(difficulty) for accuracy in accuracy_list]
+
+
+def _pp_batch_snapshot(scores: list[tuple[SimpleNamespace, Path]]) -> list[SimpleNamespace]:
+    return [snapshot_attributes(result) for result in calculate_pp_batch(scores)]
+
+
+def _pp_by_accuracy_snapshot(osu_file_path: Path, ruleset_id: int, mods: Union[list[str], int],
+                             accuracy_list: list[float]) -> list[SimpleNamespace]:
+    return [snapshot_attributes(result)
+            for result in calculate_pp_by_accuracy(osu_file_path, ruleset_id, mods, accuracy_list)]
+
+
+async def calculate_pp_batch_async(scores: list[tuple[Score, Path]]) -> list[Union[PerformanceAttributes,
+                                                                                   SimpleNamespace]]:
+    """
+    在进程池中批量计算成绩的 pp
+    :param scores: (成绩, osu 文件路径) 列表
+    :return: 与输入顺序一致、与 PerformanceAttributes 属性相同的快照
+    """
+    return await pp_pool.run(_pp_batch_snapshot, [(_score_snapshot(score), path) for score, path in scores])
+
+
+async def calculate_pp_by_accuracy_async(osu_file_path: Path, ruleset_id: int, mods: Union[list[str], int],
+                                         accuracy_list: list[float]) -> list[Union[PerformanceAttributes,
+                                                                                   SimpleNamespace]]:
+    """
+    在进程池中计算同一谱面在不同准确率下的 pp
+    :param osu_file_path:
+    :param ruleset_id:
+    :param mods:
+    :param accuracy_list: 准确率列表, 单位为百分比
+    :return: 与 accuracy_list 顺序一致、与 PerformanceAttributes 属性相同的快照
+    """
+    return await pp_pool.run(_pp_by_accuracy_snapshot, osu_file_path, ruleset_id, mods, accuracy_list)
+
+
+def _new_pp_breakpoints(current_pp_list: list[float]) -> tuple[np.ndarray, np.ndarray, np.ndarray, float]:
+    """
+    计算新成绩插入到每个位置时的 pp 增量参数
 
-    if len(current_pp_list) < 100:
-        current_pp_list.append(desired_pp_increase)
-        current_pp_list.sort(reverse=True)
-        return desired_pp_increase, current_pp_list.index(desired_pp_increase) + 1
+    设 bp 降序为 p_i, 权重 w_i = 0.95^i, 新成绩 x 插入到位置 k 时总 pp 增量为
+    x * w_k - 0.05 * S_k - drop, 其中 S_k 为位置 k 之后仍保留在 bp 中的成绩的加权和,
+    drop 为被挤出前 100 的成绩的加权 pp
 
-    total_pp = calculate_total_pp(current_pp_list)
-    current_pp_list.sort(reverse=True)
-    bp_100 = current_pp_list[99]
+    :param current_pp_list: 当前 bp 的 pp
+    :return: 每个插入位置的权重、0.05 * S_k + drop、该位置增量的下界, 以及位置个数减一
+    """
+    pp = np.sort(np.asarray(current_pp_list, dtype=float))[::-1][:_BP_LIMIT]
+    kept = min(len(pp), _BP_LIMIT - 1)
+    drop = pp[kept] * _PP_WEIGHTS[kept] if len(pp) == _BP_LIMIT else 0.0
 
-    # 使用二分查找来寻找最优的新 PP 值
-    low, high = bp_100, bp_100 + desired_pp_increase + 100
-    optimal_new_pp = high
+    weighted = pp[:kept] * _PP_WEIGHTS[:kept]
+    suffix = np.concatenate([np.cumsum(weighted[::-1])[::-1], [0.0]])
+    offset = 0.05 * suffix + drop
+    weights = _PP_WEIGHTS[:kept + 1]
 
-    while low <= high:
-        mid = (low + high) / 2
-        new_pp_list = current_pp_list[:]
-        new_pp_list.append(mid)
-        new_pp_list.sort(reverse=True)
-        new_pp_list.pop()
-        new_total_pp = calculate_total_pp(new_pp_list)
+    # 插入位置 k 要求 x >= p_k, 最后一个位置的下界为被挤出的成绩或 0
+    lower_pp = np.append(pp[:kept], pp[kept] if len(pp) == _BP_LIMIT else 0.0)
+    lower_increase = lower_pp * weights - offset
+    return weights, offset, lower_increase, kept
 
-        if new_total_pp - total_pp >= desired_pp_increase:
-            optimal_new_pp = mid
-            high = mid - 0.01
-        else:
-            low = mid + 0.01
 
-    # 计算 optimal_new_pp 在新排序列表中的位置
-    new_pp_list = current_pp_list[:]
-    new_pp_list.append(optimal_new_pp)
-    new_pp_list.sort(reverse=True)
-    position = new_pp_list.index(optimal_new_pp) + 1
+def find_optimal_new_pp_batch(current_pp_list: list[float],
+                              desired_pp_increases: list[float]) -> tuple[np.ndarray, np.ndarray]:
+    """
+    一次计算多个目标增量所需的新成绩 pp
+
+    :param current_pp_list: 当前 bp 的 pp
+    :param desired_pp_increases: 目标总 pp 增量列表
+    :return: 所需的新成绩 pp 及其在 bp 中的位置（从 1 开始）
+    """
+    weights, offset, lower_increase, kept = _new_pp_breakpoints(current_pp_list)
+    targets = np.maximum(np.asarray(desired_pp_increases, dtype=float), 0.0)
 
-    return optimal_new_pp, position
+    # lower_increase 随位置递减, 找到第一个下界不超过目标的位置
+    count = np.searchsorted(lower_increase[::-1], targets, side="right")
+    position = np.clip(kept + 1 - count, 0, kept)
+    required_pp = (targets + offset[position]) / weights[position]
+    return required_pp, position + 1
 
+
+def find_optimal_new_pp(current_pp_list: list[float], desired_pp_increase: float) -> tuple[float, int]:
+    """
+    Find the optimal new PP to achieve a desired PP increase given a list of current PP values.
+
+    :param current_pp_list: List of current PP values (list of floats)
+    :param desired_pp_increase: Desired increase in total PP (float)
+    :return: Tuple of the optimal new PP and the position at which it will be placed
+    """
+    required_pp, position = find_optimal_new_pp_batch(current_pp_list, [desired_pp_increase])
+    return float(required_pp[0]), int(position[0])
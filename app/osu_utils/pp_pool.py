@@ -0,0 +1,17 @@
+import multiprocessing
+
+from app.config.settings import PP_WORKERS, PP_QUEUE_SIZE
+from app.osu_utils.worker_pool import WorkerPool
+
+
+def _collect_cache_stats() -> dict:
+    # 在子进程中执行; pp 模块依赖 pp_pool, 在函数内导入避免循环引用
+    from app.osu_utils.pp import get_local_pp_cache_stats
+    return get_local_pp_cache_stats()
+
+
+# rosu-pp-py 计算时不释放 GIL, 所以放到独立进程中执行, 避免长图阻塞事件循环;
+# 谱面与难度缓存位于各子进程中, 统计随任务结果返回;
+# 子进程在请求处理中按需创建, 此时主进程已有其他线程, 使用 spawn 避免 fork 继承被持有的锁
+pp_pool = WorkerPool("PP", PP_WORKERS, PP_QUEUE_SIZE, mp_context=multiprocessing.get_context("spawn"),
+                     stats_collector=_collect_cache_stats)
@@ -0,0 +1,186 @@
+import asyncio
+import time
+from typing import Any, Awaitable, Callable, Optional
+
+from loguru import logger
+from ossapi.models import Score
+
+from app.config.settings import PREFETCH_CONCURRENCY, PREFETCH_API_RATE, PREFETCH_BEST_LIMIT
+from app.network.osu_api import osu_api
+from app.osu_utils.beatmap import get_osu_file_path, get_map_bg_image, get_bg_filename
+from app.osu_utils.user import get_all_bound_user_modes, get_user_avatar_image, game_mode_int_to_string
+
+
+class RateLimiter:
+    """
+    令牌桶限速, 每秒补充 rate 个令牌, 最多积累 burst 个
+    """
+
+    def __init__(self, rate: float, burst: int):
+        self._rate = rate
+        self._burst = burst
+        self._tokens = float(burst)
+        self._updated_at = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    async def acquire(self):
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                self._tokens = min(self._burst, self._tokens + (now - self._updated_at) * self._rate)
+                self._updated_at = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                await asyncio.sleep((1 - self._tokens) / self._rate)
+
+
+class Prefetcher:
+    """
+    缓存预热
+
+    遍历所有绑定用户的最近与最好成绩, 提前获取谱面文件、背景图、头像与 beatmap attributes,
+    用户查询新成绩时可以直接命中缓存; osu! API 调用按令牌桶限速, 给正常请求留出余量
+    """
+
+    def __init__(self, concurrency: int, api_rate: float, best_limit: int):
+        self._semaphore = asyncio.Semaphore(concurrency)
+        self._limiter = RateLimiter(api_rate, max(1, concurrency))
+        self._best_limit = best_limit
+        self._task: Optional[asyncio.Task] = None
+        self._schedule_task: Optional[asyncio.Task] = None
+        self._runs = 0
+        self._api_calls = 0
+        self._scores = 0
+        self._failures = 0
+        self._last_run_at: Optional[float] = None
+        self._last_duration: Optional[float] = None
+
+    async def _api(self, call: Callable[[], Awaitable[Any]]) -> Any:
+        await self._limiter.acquire()
+        self._api_calls += 1
+        return await call()
+
+    async def _prefetch_score(self, score: Score, mode: str):
+        async with self._semaphore:
+            try:
+                # 参数与成绩图接口保持一致, 才能命中同一条 API 缓存
+                await self._api(lambda: osu_api.beatmap_attributes(
+                    beatmap_id=score.beatmap.id,
+                    mods=[item.acronym for item in score.mods if item.acronym != "CL"],
+                    ruleset=mode
+                ))
+                osu_file_path = await get_osu_file_path(score.beatmapset.id, score.beatmap.id)
+                bg_name = get_bg_filename(osu_file_path)
+                await get_map_bg_image(map_id=score.beatmap.id, set_id=score.beatmapset.id, bg_name=bg_name)
+                self._scores += 1
+            except Exception as e:
+                self._failures += 1
+                logger.warning(f"Failed to prefetch beatmap {score.beatmap.id}: {e}")
+
+    async def _prefetch_user(self, uid: int, mode: str, seen: set):
+        async with self._semaphore:
+            try:
+                user_info = await self._api(lambda: osu_api.user(uid))
+                await get_user_avatar_image(user_info.id, user_info.avatar_url)
+                recent = await self._api(lambda: osu_api.user_scores(
+                    user_id=user_info.id, type="recent", mode=mode, include_fails=False
+                ))
+                best = await self._api(lambda: osu_api.user_scores(
+                    user_id=user_info.id, type="best", mode=mode, limit=self._best_limit, offset=0
+                ))
+            except Exception as e:
+                self._failures += 1
+                logger.warning(f"Failed to prefetch user {uid} ({mode}): {e}")
+                return
+
+        scores = []
+        for score in recent + best:
+            key = (score.beatmap.id, mode, tuple(sorted(item.acronym for item in score.mods)))
+            if key not in seen:
+                seen.add(key)
+                scores.append(score)
+        await asyncio.gather(*[self._prefetch_score(score, mode) for score in scores])
+
+    async def run(self):
+        """
+        预热所有绑定用户的缓存
+        """
+        started_at = time.time()
+        # 使用绑定时选择的模式, 与成绩图接口的默认模式一致, 而不是 osu! 资料中的默认模式
+        bindings = {(uid, game_mode_int_to_string(game_mode)) for uid, game_mode in await get_all_bound_user_modes()}
+        logger.info(f"Prefetching caches for {len(bindings)} bound users")
+        seen = set()
+        await asyncio.gather(*[self._prefetch_user(uid, mode, seen) for uid, mode in bindings])
+        self._runs += 1
+        self._last_run_at = started_at
+        self._last_duration = time.time() - started_at
+        logger.info(f"Prefetch finished in {self._last_duration:.1f}s")
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    def trigger(self) -> bool:
+        """
+        在后台启动一次预热
+
+        :return: 是否启动, 上一次预热还未结束时返回 False
+        """
+        if self.running:
+            return False
+        self._task = asyncio.create_task(self.run())
+        self._task.add_done_callback(self._on_done)
+        return True
+
+    def _on_done(self, task: asyncio.Task):
+        if not task.cancelled() and task.exception() is not None:
+            logger.error(f"Prefetch failed: {task.exception()}")
+
+    async def _schedule_loop(self, interval: float):
+        while True:
+            self.trigger()
+            await asyncio.sleep(interval)
+
+    def start_schedule(self, interval: float):
+        """
+        启动定时预热, 在应用启动时调用
+
+        :param interval: 间隔秒数, 为 0 时不启动
+        """
+        if interval > 0 and (self._schedule_task is None or self._schedule_task.done()):
+            self._schedule_task = asyncio.create_task(self._schedule_loop(interval))
+
+    async def stop(self):
+        """
+        停止定时预热与正在进行的预热, 在应用关闭时调用
+        """
+        for task in (self._schedule_task, self._task):
+            if task is not None:
+                task.cancel()
+                try:
+                    await task
+                except (asyncio.CancelledError, Exception):
+                    pass
+        self._schedule_task = None
+        self._task = None
+
+    def stats(self) -> dict:
+        """
+        获取预热统计
+
+        :return: 统计信息
+        """
+        return {
+            "running": self.running,
+            "scheduled": self._schedule_task is not None and not self._schedule_task.done(),
+            "runs": self._runs,
+            "api_calls": self._api_calls,
+            "scores": self._scores,
+            "failures": self._failures,
+            "last_run_at": self._last_run_at,
+            "last_duration": self._last_duration,
+        }
+
+
+prefetcher = Prefetcher(PREFETCH_CONCURRENCY, PREFETCH_API_RATE, PREFETCH_BEST_LIMIT)
@@ -2,9 +2,9 @@ from fastapi import HTTPException, Response
 from loguru import logger
 from tortoise.exceptions import DoesNotExist
 
-from app.config.settings import osu_api
+from app.network.osu_api import osu_api
 from app.draw.score import ScoreImageStrategy
-from app.osu_utils.beatmap import get_osu_file_path, get_map_bg, get_bg_filename
+from app.osu_utils.beatmap import get_osu_file_path, get_map_bg_image, get_bg_filename
 from app.osu_utils.pp import PPCalculator
 from app.osu_utils.user import game_mode_int_to_string
 from app.user.models import UserModel
@@ -19,7 +19,7 @@ async def generate_play_record_img(platform: str, platform_uid: str,
         user = await UserModel.get(platform_uid=platform_uid, platform=platform)
     except DoesNotExist:
         raise HTTPException(status_code=404, detail="User not found")
-    user_info = osu_api.user(user.osu_uid)
+    user_info = await osu_api.user(user.osu_uid)
 
     # 获取游玩记录
     if not game_mode:
@@ -42,7 +42,7 @@ async def generate_play_record_img(platform: str, platform_uid: str,
 
     try:
         logger.info(f"Getting play record for user {user_info.username}")
-        play_records = osu_api.user_scores(**params)
+        play_records = await osu_api.user_scores(**params)
     except ValueError as e:
         logger.error(f"Error when getting play record: {e}")
         raise HTTPException(status_code=400, detail=str(e))
@@ -53,7 +53,7 @@ async def generate_play_record_img(platform: str, platform_uid: str,
     # 获取 beatmap attributes
     for item in play_records[0].mods:
         print(item.acronym)
-    beatmap_attributes = osu_api.beatmap_attributes(
+    beatmap_attributes = await osu_api.beatmap_attributes(
         beatmap_id=play_records[0].beatmap.id,
         # Mods 列表排除CL
         mods=[item.acronym for item in play_records[0].mods if item.acronym != "CL"],
@@ -63,11 +63,14 @@ async def generate_play_record_img(platform: str, platform_uid: str,
     osu_file_path = await get_osu_file_path(play_records[0].beatmapset.id, play_records[0].beatmap.id)
     pp_calculate = PPCalculator(play_records[0], osu_file_path)
     bg_name = get_bg_filename(osu_file_path)
-    map_bg = await get_map_bg(map_id=play_records[0].beatmap.id, set_id=play_records[0].beatmapset.id, bg_name=bg_name)
+    map_bg = await get_map_bg_image(map_id=play_records[0].beatmap.id, set_id=play_records[0].beatmapset.id, bg_name=bg_name)
     # 绘制图片
     try:
+        await pp_calculate.precompute()
         illustration = ScoreImageStrategy(play_records[0], user_info, pp_calculate, map_bg, beatmap_attributes)
         image = await illustration.apply_theme(theme)
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Error when drawing image: {e}")
         raise HTTPException(status_code=500, detail=f"Internal server error: {e}")
@@ -82,21 +85,25 @@ async def generate_user_score_img(platform: str, platform_uid: str, beatmap_id:
         user = await UserModel.get(platform_uid=platform_uid, platform=platform)
     except DoesNotExist:
         raise HTTPException(status_code=404, detail="User not found")
-    user_info = osu_api.user(user.osu_uid)
+    user_info = await osu_api.user(user.osu_uid)
 
     try:
         logger.info(f"Getting beatmap attributes for beatmap {beatmap_id}")
-        play_record = osu_api.beatmap_user_score(
+        play_record = (await osu_api.beatmap_user_score(
             beatmap_id=beatmap_id,
             user_id=user_info.id,
             mods=mods
-        ).score
+        )).score
     except ValueError as e:
         logger.error(f"Error when getting user score: {e}")
         raise HTTPException(status_code=400, detail=str(e))
 
+    # 单图成绩不一定附带 beatmapset, 提前获取以免绘图时同步请求
+    if play_record.beatmapset is None:
+        play_record.beatmapset = await osu_api.beatmapset(beatmapset_id=play_record.beatmap.beatmapset_id)
+
     # 获取 beatmap attributes
-    beatmap_attributes = osu_api.beatmap_attributes(
+    beatmap_attributes = await osu_api.beatmap_attributes(
         beatmap_id=play_record.beatmap.id,
         mods=play_record.mods.value,
         ruleset=play_record.mode
@@ -105,11 +112,14 @@ async def generate_user_score_img(platform: str, platform_uid: str, beatmap_id:
     osu_file_path = await get_osu_file_path(play_record.beatmap.beatmapset_id, play_record.beatmap.id)
     pp_calculate = PPCalculator(play_record, osu_file_path)
     bg_name = get_bg_filename(osu_file_path)
-    map_bg = await get_map_bg(map_id=play_record.beatmap.id, set_id=play_record.beatmap.beatmapset_id, bg_name=bg_name)
+    map_bg = await get_map_bg_image(map_id=play_record.beatmap.id, set_id=play_record.beatmap.beatmapset_id, bg_name=bg_name)
     # 绘制图片
     try:
+        await pp_calculate.precompute()
         illustration = ScoreImageStrategy(play_record, user_info, pp_calculate, map_bg, beatmap_attributes)
         image = await illustration.apply_theme(theme)
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Error when drawing image: {e}")
         raise HTTPException(status_code=500, detail=f"Internal server error: {e}")
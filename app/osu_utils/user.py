@@ -1,17 +1,20 @@
 from typing import Dict, Any
 
 import httpx
+from PIL import Image
 from loguru import logger
 
-from app.network.network import httpx_request
-from app.network.public_token import PublicToken
-from app.osu_utils.file import cache_dir
+from app.database.image_cache import image_cache
+from app.network.network import httpx_request, get_http_client
+from app.network.download import download_manager
+from app.network.public_token import public_token
+from app.osu_utils.file import cache_dir, read_bytes
 from app.user.models import UserModel
 
 
 class OsuUser:
     def __init__(self):
-        self.token_client = PublicToken()
+        self.token_client = public_token
 
     async def get_user_uid(self, osu_username: str) -> Dict[str, Any]:
         max_retries = 2  # 设置最大重试次数，防止无限循环
@@ -31,7 +34,7 @@ class OsuUser:
                 if e.response.status_code == 404:
                     raise Exception("User not found")
                 elif e.response.status_code == 401:
-                    await self.token_client.set_public_token()
+                    await self.token_client.set_public_token(stale_token=token)
                     logger.warning("Token refreshed, retrying...")
                     continue  # Token 已刷新，进行下一次循环重试
                 else:
@@ -60,8 +63,8 @@ async def download_user_avatar(avatar_url: str) -> bytes:
     :param avatar_url:
     :return:
     """
-    async with httpx.AsyncClient() as client:
-        response = await client.get(avatar_url)
+    response = await get_http_client(avatar_url).get(avatar_url)
+    response.raise_for_status()
     return response.content
 
 
@@ -72,20 +75,17 @@ async def get_user_avatar(uid: int, avatar_url: str) -> bytes:
     :param avatar_url:
     :return:
     """
-    path = cache_dir / "user" / f"{uid}"
-    file_affix = avatar_url.split(".")[-1]
-    if not path.exists():
-        path.mkdir(parents=True, exist_ok=True)
-    file_name = f"{uid}.{file_affix}"
-    if (path / file_name).exists():
-        with open((path / file_name), "rb") as f:
-            content = f.read()
-    else:
-        with open((path / file_name), "wb") as f:
-            file = await download_user_avatar(avatar_url)
-            f.write(file)
-            content = file
-    return content
+    return await download_manager.get(f"avatar/{uid}/{avatar_url}", lambda: download_user_avatar(avatar_url))
+
+
+async def get_user_avatar_image(uid: int, avatar_url: str) -> Image.Image:
+    """
+    获取解码后的用户头像
+    :param uid:
+    :param avatar_url:
+    :return: RGBA 图片
+    """
+    return await image_cache.get(f"avatar/{uid}/{avatar_url}", lambda: get_user_avatar(uid, avatar_url))
 
 
 async def download_user_badge(img_url: str) -> bytes:
@@ -94,8 +94,8 @@ async def download_user_badge(img_url: str) -> bytes:
     :param img_url:
     :return:
     """
-    async with httpx.AsyncClient() as client:
-        response = await client.get(img_url)
+    response = await get_http_client(img_url).get(img_url)
+    response.raise_for_status()
     return response.content
 
 
@@ -107,19 +107,21 @@ async def get_user_badge(uid: int, img_url: str, description: str) -> bytes:
     :param description:
     :return:
     """
-    path = cache_dir / "user" / f"{uid}"
-    if not path.exists():
-        path.mkdir(parents=True, exist_ok=True)
-    file_name = f"{description}.png"
-    if (path / file_name).exists():
-        with open((path / file_name), "rb") as f:
-            content = f.read()
-    else:
-        with open((path / file_name), "wb") as f:
-            file = await download_user_badge(img_url)
-            f.write(file)
-            content = file
-    return content
+    return await download_manager.get(f"badge/{img_url}", lambda: download_user_badge(img_url))
+
+
+async def get_user_badge_image(img_url: str) -> Image.Image:
+    """
+    获取解码后的用户徽章
+    :param img_url:
+    :return: RGBA 图片
+    """
+    cache_key = f"badge/{img_url}"
+
+    async def load() -> bytes:
+        return await download_manager.get(cache_key, lambda: download_user_badge(img_url))
+
+    return await image_cache.get(cache_key, load)
 
 
 async def get_redirected_bg():
@@ -127,34 +129,30 @@ async def get_redirected_bg():
     获取重定向后的背景图片
     :return:
     """
-    async with httpx.AsyncClient() as client:
-        # 禁止自动跟随重定向
-        response = await client.get("https://api.gumengya.com/Api/DmImg?format=image", follow_redirects=False)
+    url = "https://api.gumengya.com/Api/DmImg?format=image"
+    # 禁止自动跟随重定向
+    response = await get_http_client(url).get(url, follow_redirects=False)
 
-        # 检查响应状态码，看是否是重定向
-        if response.status_code in (301, 302, 303, 307, 308):
-            # 获取重定向的 URL
-            redirect_url = response.headers.get("Location")
+    # 检查响应状态码，看是否是重定向
+    if response.status_code in (301, 302, 303, 307, 308):
+        # 获取重定向的 URL
+        redirect_url = response.headers.get("Location")
 
-            # 根据重定向的 URL 发起新的请求
-            redirected_response = await client.get(redirect_url)
+        # 根据重定向的 URL 发起新的请求
+        redirected_response = await get_http_client(redirect_url).get(redirect_url)
 
-            # 返回重定向后的响应内容
-            return redirected_response.content
-        else:
-            # 如果没有重定向，直接返回原始响应内容
-            return response.content
+        # 返回重定向后的响应内容
+        return redirected_response.content
+    else:
+        # 如果没有重定向，直接返回原始响应内容
+        return response.content
 
 
 async def get_info_bg(osu_uid: int) -> bytes:
-    path = cache_dir / "user" / f"{osu_uid}"
-    if not path.exists():
-        path.mkdir(parents=True, exist_ok=True)
-    file_name = "info.png"
-    if (path / file_name).exists():
-        with open((path / file_name), "rb") as f:
-            content = f.read()
-    else:
+    path = cache_dir / "user" / f"{osu_uid}" / "info.png"
+    try:
+        content = await read_bytes(path)
+    except FileNotFoundError:
         content = await get_redirected_bg()
 
     return content
@@ -167,3 +165,12 @@ async def get_all_bound_users() -> list:
     """
     unique_osu_uid = await UserModel.all().distinct().values_list("osu_uid", flat=True)
     return list(set(unique_osu_uid))
+
+
+async def get_all_bound_user_modes() -> list:
+    """
+    获取所有绑定用户及其绑定的游戏模式, 同一 osu! 账号可能以不同模式被多次绑定
+    :return: 去重后的 (osu_uid, game_mode) 列表
+    """
+    bindings = await UserModel.all().distinct().values_list("osu_uid", "game_mode")
+    return list(set(bindings))
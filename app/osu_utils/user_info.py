@@ -1,14 +1,15 @@
 from datetime import datetime, timedelta
+from typing import List
 
 from fastapi import HTTPException, Response, UploadFile
 from loguru import logger
 from tortoise.exceptions import DoesNotExist
 
-from app.config.settings import osu_api
+from app.network.osu_api import osu_api
 from app.draw.user_info import UserInfoImageStrategy, UserBPAnalyzeImageStrategy
 from app.osu_utils.user import game_mode_int_to_string
-from app.osu_utils.file import cache_dir
-from app.osu_utils.pp import find_optimal_new_pp
+from app.osu_utils.file import cache_dir, write_bytes
+from app.osu_utils.pp import find_optimal_new_pp, find_optimal_new_pp_batch
 from app.user.models import UserModel, UserOsuInfoHistory
 
 
@@ -31,11 +32,11 @@ async def generate_player_info_img(platform: str, platform_uid: str, game_mode:
     # 获取osu玩家信息
     if user_name:
         logger.info(f"Getting player info for user {user_name}")
-        osu_player_info = osu_api.user(user=user_name, mode=game_mode, key="username")
+        osu_player_info = await osu_api.user(user=user_name, mode=game_mode, key="username")
     else:
         logger.info(f"Getting player info for user {user.osu_uid}")
-        osu_player_info = osu_api.user(user=user.osu_uid, mode=game_mode, key="id")
-    osu_player_scores = osu_api.user_scores(user_id=user.osu_uid, type="best", mode=game_mode, limit=100)
+        osu_player_info = await osu_api.user(user=user.osu_uid, mode=game_mode, key="id")
+    osu_player_scores = await osu_api.user_scores(user_id=user.osu_uid, type="best", mode=game_mode, limit=100)
 
     # 获取对比玩家信息
     now = datetime.now()
@@ -59,6 +60,8 @@ async def generate_player_info_img(platform: str, platform_uid: str, game_mode:
         illustration = UserInfoImageStrategy(osu_player_info, osu_player_history_info, game_mode.upper(),
                                              osu_player_scores)
         image = await illustration.apply_theme(theme)
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"An error occurred while generating user info image: {e}")
         raise HTTPException(status_code=500, detail=f"Internal server error: {e}")
@@ -68,7 +71,7 @@ async def generate_player_info_img(platform: str, platform_uid: str, game_mode:
 
 async def save_user_info(uid: str, game_mode: int):
     mode = game_mode_int_to_string(game_mode)
-    osu_player_info = osu_api.user(uid, mode=mode, key="id")
+    osu_player_info = await osu_api.user(uid, mode=mode, key="id")
     try:
         user_database_instance = await UserOsuInfoHistory.get(
             osu_uid=uid,
@@ -106,23 +109,20 @@ async def update_user_info_background(platform: str, platform_uid: str, file: Up
         raise HTTPException(status_code=404, detail="User not found")
 
     # 保存背景图片
-    path = cache_dir / "user" / f"{user.osu_uid}"
-    if not path.exists():
-        path.mkdir(parents=True, exist_ok=True)
-    file_name = "info.png"
-    with open((path / file_name), "wb") as f:
-        f.write(await file.read())
+    path = cache_dir / "user" / f"{user.osu_uid}" / "info.png"
+    await write_bytes(path, await file.read())
 
     return {"message": "Background updated successfully"}
 
 
-async def generate_player_pp_control_result(platform: str, platform_uid: str, pp: float):
+async def generate_player_pp_control_result(platform: str, platform_uid: str, pp: float,
+                                            targets: List[float] = None):
     # 获取用户信息
     try:
         user = await UserModel.get(platform_uid=platform_uid, platform=platform)
     except DoesNotExist:
         raise HTTPException(status_code=404, detail="User not found")
-    user_info = osu_api.user(user.osu_uid)
+    user_info = await osu_api.user(user.osu_uid)
 
     params = {
         "user_id": user_info.id,
@@ -134,7 +134,7 @@ async def generate_player_pp_control_result(platform: str, platform_uid: str, pp
 
     try:
         logger.info(f"Getting best 100 play record for user {user_info.username}")
-        play_records = osu_api.user_scores(**params)
+        play_records = await osu_api.user_scores(**params)
     except ValueError as e:
         logger.error(f"Error when getting play record: {e}")
         raise HTTPException(status_code=400, detail=str(e))
@@ -146,8 +146,17 @@ async def generate_player_pp_control_result(platform: str, platform_uid: str, pp
     for record in play_records:
         pp_list.append(record.pp)
     required_pp = find_optimal_new_pp(pp_list, pp)
+    result = {"required_pp": required_pp}
 
-    return {"required_pp": required_pp}
+    # 一次计算多个目标增量, 用于绘制曲线
+    if targets:
+        curve_pp, curve_position = find_optimal_new_pp_batch(pp_list, targets)
+        result["curve"] = [
+            {"pp": target, "required_pp": float(required), "position": int(position)}
+            for target, required, position in zip(targets, curve_pp, curve_position)
+        ]
+
+    return result
 
 
 async def generate_player_pp_analyze_img(platform: str, platform_uid: str, theme: str):
@@ -156,7 +165,7 @@ async def generate_player_pp_analyze_img(platform: str, platform_uid: str, theme
         user = await UserModel.get(platform_uid=platform_uid, platform=platform)
     except DoesNotExist:
         raise HTTPException(status_code=404, detail="User not found")
-    user_info = osu_api.user(user.osu_uid)
+    user_info = await osu_api.user(user.osu_uid)
 
     params = {
         "user_id": user_info.id,
@@ -168,7 +177,7 @@ async def generate_player_pp_analyze_img(platform: str, platform_uid: str, theme
 
     try:
         logger.info(f"Getting best 100 play record for user {user_info.username}")
-        play_records = osu_api.user_scores(**params)
+        play_records = await osu_api.user_scores(**params)
     except ValueError as e:
         logger.error(f"Error when getting play record: {e}")
         raise HTTPException(status_code=400, detail=str(e))
@@ -179,6 +188,8 @@ async def generate_player_pp_analyze_img(platform: str, platform_uid: str, theme
     try:
         illustration = UserBPAnalyzeImageStrategy(user_info, play_records)
         image = await illustration.apply_theme(theme)
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"An error occurred while generating user info image: {e}")
         raise HTTPException(status_code=500, detail=f"Internal server error: {e}")
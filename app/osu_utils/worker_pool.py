@@ -0,0 +1,206 @@
+import asyncio
+import functools
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from multiprocessing.context import BaseContext
+from typing import Any, Callable, Dict, List, Optional
+
+from fastapi import HTTPException
+from loguru import logger
+
+
+def _run_job(func: Callable, args: tuple, kwargs: dict,
+             stats_collector: Optional[Callable[[], dict]]) -> tuple[float, Any, int, Optional[dict]]:
+    started_at = time.time()
+    result = func(*args, **kwargs)
+    return started_at, result, os.getpid(), stats_collector() if stats_collector is not None else None
+
+
+class WorkerPool:
+    """
+    有界进程池, 用于 pp 计算、图片绘制等会长时间占用 GIL 的任务
+
+    排队的任务超过 queue_size 时直接返回 503; 设置 timeout 后, 超时的请求返回 504,
+    并换用新的子进程, 旧进程在一个 timeout 后被结束, 超时的任务不再占用排队名额;
+    设置 stats_collector 后, 每个任务结束时在子进程中调用它, 保存各子进程最近一次返回的统计
+    """
+
+    def __init__(self, name: str, max_workers: int, queue_size: int, timeout: Optional[float] = None,
+                 mp_context: Optional[BaseContext] = None, initializer: Optional[Callable] = None,
+                 stats_collector: Optional[Callable[[], dict]] = None):
+        self._name = name
+        self._max_workers = max_workers
+        self._queue_size = queue_size
+        self._timeout = timeout
+        self._mp_context = mp_context
+        self._initializer = initializer
+        self._stats_collector = stats_collector
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._pending = 0
+        self._submitted = 0
+        self._completed = 0
+        self._failed = 0
+        self._rejected = 0
+        self._timeouts = 0
+        self._wait_total = 0.0
+        self._wait_max = 0.0
+        self._run_total = 0.0
+        # 以子进程 pid 为键; 进程池重建后旧进程返回的统计不再记录
+        self._worker_stats: Dict[int, dict] = {}
+        self._generation = 0
+        # 因超时被替换、等待结束的旧进程
+        self._retired: list = []
+
+    @property
+    def enabled(self) -> bool:
+        return self._max_workers > 0
+
+    def start(self):
+        """
+        创建进程池, 在应用启动时调用
+        """
+        if self.enabled and self._executor is None:
+            self._executor = ProcessPoolExecutor(max_workers=self._max_workers, mp_context=self._mp_context,
+                                                 initializer=self._initializer)
+
+    def _discard_executor(self, cancel_futures: bool):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=cancel_futures)
+            self._executor = None
+        self._worker_stats.clear()
+        self._generation += 1
+        # 旧进程池中的任务不再占用新进程池的排队名额
+        self._pending = 0
+
+    def _reset(self):
+        # 子进程异常退出后进程池不可再用, 重建后交给调用方处理本次失败
+        logger.error(f"{self._name} worker pool is broken, recreating")
+        self._discard_executor(cancel_futures=True)
+
+    def _retire(self):
+        # 超时的任务可能一直不结束, 继续占用子进程与排队名额; 新任务改用新的子进程,
+        # 旧进程再等待一个 timeout 后强制结束, 届时其中其他任务的调用方也都已超时
+        executor = self._executor
+        # ProcessPoolExecutor 没有结束子进程的公开接口, shutdown 之后 _processes 也会被清空
+        processes = list(executor._processes.values()) if executor is not None and executor._processes else []
+        logger.warning(f"{self._name} worker pool timed out, replacing {len(processes)} workers")
+        self._discard_executor(cancel_futures=False)
+        self._retired.extend(processes)
+        asyncio.get_running_loop().call_later(self._timeout, self._terminate, processes)
+
+    def _terminate(self, processes: list):
+        for process in processes:
+            if process.is_alive():
+                process.terminate()
+            if process in self._retired:
+                self._retired.remove(process)
+
+    def recycle(self):
+        """
+        换用新的子进程, 用于清空子进程中的缓存; 已提交的任务仍在旧进程中执行完毕
+        """
+        self._discard_executor(cancel_futures=False)
+
+    def _on_done(self, generation: int, future: asyncio.Future):
+        if generation == self._generation:
+            self._pending -= 1
+        if not future.cancelled():
+            future.exception()
+
+    async def run(self, func: Callable, *args, **kwargs) -> Any:
+        """
+        在进程池中执行计算, 进程池未启用时直接在当前线程执行
+
+        :param func: 模块级函数, 参数与返回值需要可以被 pickle
+        :return: func 的返回值
+        """
+        if not self.enabled:
+            return func(*args, **kwargs)
+        if self._pending >= self._max_workers + self._queue_size:
+            self._rejected += 1
+            raise HTTPException(status_code=503, detail="Server busy, please try again later")
+
+        self.start()
+        submitted_at = time.time()
+        generation = self._generation
+        loop = asyncio.get_running_loop()
+        try:
+            future = loop.run_in_executor(self._executor,
+                                          functools.partial(_run_job, func, args, kwargs, self._stats_collector))
+        except BrokenProcessPool:
+            self._failed += 1
+            if generation == self._generation:
+                self._reset()
+            raise
+        self._pending += 1
+        self._submitted += 1
+        # 排队数量在任务真正结束时才减少, 调用方取消不影响; 换用新的子进程时清零
+        future.add_done_callback(functools.partial(self._on_done, generation))
+        try:
+            started_at, result, pid, worker_stats = await asyncio.wait_for(asyncio.shield(future), self._timeout)
+        except asyncio.TimeoutError:
+            self._timeouts += 1
+            if generation == self._generation:
+                self._retire()
+            raise HTTPException(status_code=504, detail="Processing timed out, please try again later")
+        except BrokenProcessPool:
+            self._failed += 1
+            # 子进程退出时所有进行中的任务都会收到 BrokenProcessPool, 只由第一个调用方重建,
+            # 之后的调用方不能再关闭新的进程池, 否则会取消其他请求刚提交的任务
+            if generation == self._generation:
+                self._reset()
+            raise
+        except Exception:
+            self._failed += 1
+            raise
+
+        finished_at = time.time()
+        if worker_stats is not None and generation == self._generation:
+            self._worker_stats[pid] = worker_stats
+        wait = max(started_at - submitted_at, 0.0)
+        self._completed += 1
+        self._wait_total += wait
+        self._wait_max = max(self._wait_max, wait)
+        self._run_total += finished_at - started_at
+        return result
+
+    def worker_stats(self) -> List[dict]:
+        """
+        获取各子进程最近一次由 stats_collector 返回的统计
+
+        :return: 统计列表, 还没有执行过任务的子进程不在其中
+        """
+        return list(self._worker_stats.values())
+
+    def shutdown(self):
+        """
+        关闭进程池, 在应用关闭时调用
+        """
+        self._terminate(list(self._retired))
+        if self._executor is not None:
+            self._executor.shutdown(wait=True, cancel_futures=True)
+            self._executor = None
+
+    def stats(self) -> dict:
+        """
+        获取进程池统计, 时间单位为毫秒
+
+        :return: 统计信息
+        """
+        return {
+            "workers": self._max_workers,
+            "timeout": self._timeout,
+            "queue_size": self._queue_size,
+            "pending": self._pending,
+            "submitted": self._submitted,
+            "completed": self._completed,
+            "failed": self._failed,
+            "rejected": self._rejected,
+            "timeouts": self._timeouts,
+            "avg_wait_ms": self._wait_total / self._completed * 1000 if self._completed else 0,
+            "max_wait_ms": self._wait_max * 1000,
+            "avg_run_ms": self._run_total / self._completed * 1000 if self._completed else 0,
+        }
+
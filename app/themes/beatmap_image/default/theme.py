@@ -6,39 +6,45 @@ from PIL import Image, ImageDraw
 from ossapi.models import Beatmap, User
 from rosu_pp_py import PerformanceAttributes
 
+from app.draw.asset_store import asset_store
 from app.draw.fonts import *
 from app.draw.utils import draw_fillet
-from app.osu_utils.user import get_user_avatar
+from app.osu_utils.user import get_user_avatar_image
 from app.themes.beatmap_image.default.assets import MapBg, ManiaMapBg, IconLs
-from app.themes.beatmap_image.default.img_process import preprocess_bg, draw_stars_diff
+from app.database.image_cache import derived_image_cache
+from app.themes.beatmap_image.default.img_process import preprocess_bg, draw_stars_diff, BG_OPS
 from app.themes.theme_interface import ThemeStrategy
 
 
 class DefaultTheme(ThemeStrategy):
-    async def process_data(self, *args: Union[Beatmap, PerformanceAttributes, User, str, bytes]) -> bytes:
+    async def prepare(self, *args: Union[Beatmap, PerformanceAttributes, User, str, Image.Image]) -> dict:
+        mapper_info = args[2]
+        return {"mapper_avatar": await get_user_avatar_image(mapper_info.id, mapper_info.avatar_url)}
+
+    async def process_data(self, *args: Union[Beatmap, PerformanceAttributes, User, str, Image.Image],
+                           resources: dict) -> bytes:
         # 初始化参数
         beatmap_info = args[0]
         ss_pp_info = args[1]
         mapper_info = args[2]
         bg_name = args[3]
-        map_bg = Image.open(BytesIO(args[4])).convert("RGBA")
+        map_bg = args[4]
         # 初始化画布
         im = Image.new("RGBA", (1200, 600))
         draw = ImageDraw.Draw(im)
         # 绘制背景
-        processed_bg = await preprocess_bg(map_bg)
+        processed_bg = await derived_image_cache.get(map_bg, "beatmap_image/default", BG_OPS, preprocess_bg)
         im.alpha_composite(processed_bg, (0, 0))
         # 绘制layout
         if beatmap_info.rule_set in {3, 7}:
-            layout = Image.open(ManiaMapBg).convert("RGBA")
+            layout = asset_store.get(ManiaMapBg)
         else:
-            layout = Image.open(MapBg).convert("RGBA")
+            layout = asset_store.get(MapBg)
         im.alpha_composite(layout, (0, 0))
         # 绘制模式
         draw.text((50, 65), IconLs[beatmap_info.mode.name.lower()], font=EXTRA_30, anchor="lt")
         # 绘制星级
-        stars_bg = draw_stars_diff(ss_pp_info.difficulty.stars)
-        stars_img = stars_bg.resize((80, 30))
+        stars_img = draw_stars_diff(ss_pp_info.difficulty.stars, (80, 30))
         im.alpha_composite(stars_img, (90, 65))
         if ss_pp_info.difficulty.stars < 6.5:
             color = (0, 0, 0, 255)
@@ -77,8 +83,8 @@ class DefaultTheme(ThemeStrategy):
         im.alpha_composite(diff_length_img, (890, 566))
         draw.text((1170, 568), f"{star:.2f}", font=Harmony_Sans_Bold_20, anchor="mm")
         # mapper
-        user_icon = await get_user_avatar(mapper_info.id, mapper_info.avatar_url)
-        icon = Image.open(BytesIO(user_icon)).convert("RGBA").resize((100, 100))
+        user_icon = resources["mapper_avatar"]
+        icon = user_icon.resize((100, 100))
         icon_img = draw_fillet(icon, 10)
         im.alpha_composite(icon_img, (50, 400))
         # map id
@@ -5,15 +5,21 @@ from typing import Union
 from PIL import Image, ImageDraw
 from ossapi.models import Beatmapset
 
+from app.draw.asset_store import asset_store
 from app.draw.fonts import (Harmony_Sans_Bold_40, Harmony_Sans_Bold_50, Harmony_Sans_Bold_20, Harmony_Sans_Bold_15, EXTRA_30)
-from app.osu_utils.beatmap import get_map_bg
+from app.osu_utils.beatmap import get_map_bg_image
 from app.themes.beatmapset_image.default.assets import BarImg, IconLs
-from app.themes.beatmapset_image.default.img_process import preprocess_bg, draw_stars_diff
+from app.database.image_cache import derived_image_cache
+from app.themes.beatmapset_image.default.img_process import preprocess_bg, draw_stars_diff, BG_OPS
 from app.themes.theme_interface import ThemeStrategy
 
 
 class DefaultTheme(ThemeStrategy):
-    async def process_data(self, *args: Union[Beatmapset]) -> bytes:
+    async def prepare(self, *args: Union[Beatmapset]) -> dict:
+        beatmapset_info = args[0]
+        return {"cover": await get_map_bg_image(set_id=beatmapset_info.id)}
+
+    async def process_data(self, *args: Union[Beatmapset], resources: dict) -> bytes:
         # 初始化参数
         beatmapset_info = args[0]
         # 新建画布
@@ -24,9 +30,7 @@ class DefaultTheme(ThemeStrategy):
         im = Image.new("RGBA", (1200, img_height), (31, 41, 46, 255))
         draw = ImageDraw.Draw(im)
         # 背景
-        cover = await get_map_bg(set_id=beatmapset_info.id)
-        cover = Image.open(BytesIO(cover))
-        cover_img = preprocess_bg(cover)
+        cover_img = await derived_image_cache.get(resources["cover"], "beatmapset_image/default", BG_OPS, preprocess_bg)
         im.alpha_composite(cover_img, (0, 0))
         # 曲名
         draw.text((25, 15), beatmapset_info.title, font=Harmony_Sans_Bold_40, anchor="lt")
@@ -57,11 +61,10 @@ class DefaultTheme(ThemeStrategy):
                 # 难度
                 draw.text((20, 320 + h_num), IconLs[item.mode.name.lower()], font=EXTRA_30, anchor="lt")
                 # 星星
-                stars_bg = draw_stars_diff(item.difficulty_rating)
-                stars_img = stars_bg.resize((80, 30))
+                stars_img = draw_stars_diff(item.difficulty_rating, (80, 30))
                 im.alpha_composite(stars_img, (60, 320 + h_num))
                 # diff
-                im.alpha_composite(Image.open(str(BarImg)), (10, 365 + h_num))
+                im.alpha_composite(asset_store.get(BarImg), (10, 365 + h_num))
                 gc = ["CS", "HP", "OD", "AR"]
                 for index, i in enumerate((item.cs, item.drain, item.accuracy, item.ar)):
                     diff_len = int(200 * i / 10) if i <= 10 else 200
@@ -1,6 +1,7 @@
 from jinja2 import Environment, FileSystemLoader
 from pathlib import Path
 
+from app.osu_utils.file import write_text
 from app.osu_utils.html_render import html_to_image
 
 MAIN_PATH = Path(__file__).parent
@@ -14,8 +15,7 @@ async def draw_bpa_plot(pp_ls, length_ls) -> bytes:
     # 加载模板
     template = env.get_template('bpa_chart.html')
     output = template.render(pp_ls=pp_ls, length_ls=length_ls)
-    with open("output.html", "w") as f:
-        f.write(output)
+    await write_text(Path("output.html"), output)
     return await html_to_image(output, 900, 550)
 
 
@@ -27,6 +27,5 @@ async def draw_mod_pp_plot(mod_pp_ls) -> bytes:
     # 加载模板
     template = env.get_template('mod_chart.html')
     output = template.render(mod_pp_ls=mod_pp_ls)
-    with open("output.html", "w") as f:
-        f.write(output)
+    await write_text(Path("output.html"), output)
     return await html_to_image(output, 450, 300)
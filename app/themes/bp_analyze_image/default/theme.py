@@ -7,7 +7,7 @@ from PIL import Image, ImageDraw
 from ossapi.models import User, Score, Grade
 from ossapi import Mod
 
-from app.config.settings import osu_api
+from app.network.osu_api import osu_api
 from app.draw.fonts import *
 from app.themes.theme_interface import ThemeStrategy
 from app.themes.bp_analyze_image.default.templates import draw_bpa_plot, draw_mod_pp_plot
@@ -60,7 +60,7 @@ class DefaultTheme(ThemeStrategy):
         users = []
         for i in mapper_pp:
             try:
-                users.append(osu_api.user(i[0], mode="osu", key="id"))
+                users.append(await osu_api.user(i[0], mode="osu", key="id"))
             except ValueError:
                 continue
         user_dic = {i.id: i.username for i in users}
@@ -1,3 +1,4 @@
+import asyncio
 import re
 from datetime import datetime
 from io import BytesIO
@@ -9,20 +10,43 @@ from loguru import logger
 from ossapi import TeamType
 from ossapi.models import MatchResponse, MatchEventType
 
-from app.osu_utils.beatmap import get_map_bg
-from app.config.settings import osu_api
+from app.database.image_cache import derived_image_cache
+from app.osu_utils.beatmap import get_map_bg_image
+from app.network.osu_api import osu_api
+from app.draw.asset_store import asset_store
 from app.draw.fonts import *
 from app.draw.utils import draw_fillet
-from app.osu_utils.user import get_user_avatar
+from app.osu_utils.user import get_user_avatar_image
 from app.themes.match_history_image.default.img_process import (preprocess_bg, get_score_diff, draw_stars_diff,
-                                                                get_top3, get_top3_color)
+                                                                get_top3, get_top3_color, BG_OPS)
 from app.osu_utils.multiplayer import analyze_team_vs_game_history, get_win_side
 from app.themes.theme_interface import ThemeStrategy
 from app.themes.match_history_image.default.assets import HeaderImg, BodyImg, TeamBlue, TeamRed, get_mod_image
 
 
 class DefaultTheme(ThemeStrategy):
-    async def process_data(self, *args: Union[MatchResponse]) -> bytes:
+    async def prepare(self, *args: Union[MatchResponse]) -> dict:
+        match_info = args[0]
+        games = [event.game for event in match_info.events
+                 if event.detail.type == MatchEventType.OTHER and event.game is not None and event.game.scores]
+        user_ids = {entry.user_id for game in games for entry in game.scores}
+        users = [user for user in match_info.users if user.id in user_ids]
+        beatmapset_ids = list({game.beatmap.beatmapset_id for game in games if game.beatmap})
+        games = [game for game in games if game.beatmap]
+
+        avatars, covers, attributes = await asyncio.gather(
+            asyncio.gather(*[get_user_avatar_image(user.id, user.avatar_url) for user in users]),
+            asyncio.gather(*[get_map_bg_image(set_id=set_id) for set_id in beatmapset_ids]),
+            asyncio.gather(*[osu_api.beatmap_attributes(beatmap_id=game.beatmap_id, mods=game.mods, ruleset=game.mode)
+                             for game in games]),
+        )
+        return {
+            "avatars": {user.id: avatar for user, avatar in zip(users, avatars)},
+            "covers": dict(zip(beatmapset_ids, covers)),
+            "stars": {game.id: data.attributes.star_rating for game, data in zip(games, attributes)},
+        }
+
+    async def process_data(self, *args: Union[MatchResponse], resources: dict) -> bytes:
         match_info = args[0]
 
         pattern = r"([^:]+): [\(\（](.+?)[\)\）] vs [\(\（](.+?)[\)\）]"
@@ -66,7 +90,7 @@ class DefaultTheme(ThemeStrategy):
         im = Image.new("RGBA", (1420, 280 + (280 * (len(game_history)) + 90)),
                        (31, 41, 46, 255))
         draw = ImageDraw.Draw(im)
-        im.alpha_composite(Image.open(HeaderImg).convert("RGBA"), (0, 0))
+        im.alpha_composite(asset_store.get(HeaderImg), (0, 0))
         # 绘制标题
         if match_name:
             match_title = match_name.group(1)
@@ -120,7 +144,7 @@ class DefaultTheme(ThemeStrategy):
                 continue
             sequence = i - number_of_invalid_records
             logger.info(f"开始绘制第{sequence + 1}局")
-            im.alpha_composite(Image.open(BodyImg).convert("RGBA"), (0, 280 * sequence + 280))
+            im.alpha_composite(asset_store.get(BodyImg), (0, 280 * sequence + 280))
             # 计算分差
             score_diff = get_score_diff(game)
             draw.text(
@@ -132,9 +156,9 @@ class DefaultTheme(ThemeStrategy):
             # 绘制地图胜利方
             win_side = get_win_side(game)
             if win_side == "red":
-                im.alpha_composite(Image.open(TeamRed).convert("RGBA"), (288, 280 * sequence + 280 + 36))
+                im.alpha_composite(asset_store.get(TeamRed), (288, 280 * sequence + 280 + 36))
             elif win_side == "blue":
-                im.alpha_composite(Image.open(TeamBlue).convert("RGBA"), (838, 280 * sequence + 280 + 36))
+                im.alpha_composite(asset_store.get(TeamBlue), (838, 280 * sequence + 280 + 36))
             gutter = 570 // (analyzed_game_history["team_size"] + 1)
             # 获取top3分数
             top3 = get_top3(game.scores)
@@ -171,8 +195,8 @@ class DefaultTheme(ThemeStrategy):
                         fill="black"
                     )
                 # 绘制头像
-                user_icon = await get_user_avatar(user_info.id, user_info.avatar_url)
-                user_icon = Image.open(BytesIO(user_icon)).convert("RGBA").resize((60, 60))
+                user_icon = resources["avatars"][user_info.id]
+                user_icon = user_icon.resize((60, 60))
                 user_icon = draw_fillet(user_icon, 10)
                 score_img.alpha_composite(user_icon, ((slot + 1) * gutter - 30, 45))
                 # 绘制用户名
@@ -232,8 +256,8 @@ class DefaultTheme(ThemeStrategy):
                         fill="black"
                     )
                 # 绘制头像
-                user_icon = await get_user_avatar(user_info.id, user_info.avatar_url)
-                user_icon = Image.open(BytesIO(user_icon)).convert("RGBA").resize((60, 60))
+                user_icon = resources["avatars"][user_info.id]
+                user_icon = user_icon.resize((60, 60))
                 user_icon = draw_fillet(user_icon, 10)
                 score_img.alpha_composite(user_icon, ((slot + 1) * gutter - 30, 45))
                 # 绘制用户名
@@ -266,9 +290,9 @@ class DefaultTheme(ThemeStrategy):
             if not map_info:
                 logger.error(f"第{sequence + 1}局地图信息为空")
                 continue
-            map_bg = await get_map_bg(set_id=map_info.beatmapset_id)
-            bg = Image.open(BytesIO(map_bg)).convert("RGBA")
-            preprocessed_bg = preprocess_bg(bg)
+            bg = resources["covers"][map_info.beatmapset_id]
+            preprocessed_bg = await derived_image_cache.get(bg, "match_history_image/default", BG_OPS,
+                                                            preprocess_bg)
             im.alpha_composite(preprocessed_bg, (590, 280 * sequence + 280 + 40))
             # 绘制地图信息
             map_title = f"{game.beatmap.beatmapset().title}"
@@ -323,14 +347,12 @@ class DefaultTheme(ThemeStrategy):
                 if s_mods == "NF":
                     continue
                 mods_bg = get_mod_image(str(s_mods))
-                mods_img = Image.open(mods_bg).convert("RGBA")
+                mods_img = asset_store.get(mods_bg)
                 im.alpha_composite(mods_img, (550 + 50 * mods_num, 280 * i + 280 + 170))
             # 难度星数
-            attribute_data = osu_api.beatmap_attributes(beatmap_id=game.beatmap_id, mods=game.mods, ruleset=game.mode)
-            stars = attribute_data.attributes.star_rating
+            stars = resources["stars"][game.id]
             total_stars += stars
-            stars_img = draw_stars_diff(stars)
-            stars_img = stars_img.resize((90, 36))
+            stars_img = draw_stars_diff(stars, (90, 36))
             im.alpha_composite(stars_img, (740, 280 * sequence + 280 + 167))
             draw.text(
                 (787, 280 * sequence + 280 + 175),
@@ -1,3 +1,4 @@
+import asyncio
 import re
 from datetime import datetime
 from io import BytesIO
@@ -10,9 +11,10 @@ from ossapi.models import MatchResponse, MatchEventType, TeamType
 
 from app.osu_utils.multiplayer import PlayerMatchStats, analyze_team_vs_game_history, analyze_head_to_head_history
 from app.osu_utils.rating import PlayerRatingCalculation
+from app.draw.asset_store import asset_store
 from app.draw.fonts import *
 from app.draw.utils import draw_rounded_rectangle, crop_image, draw_fillet
-from app.osu_utils.user import get_user_avatar
+from app.osu_utils.user import get_user_avatar_image
 
 from app.themes.theme_interface import ThemeStrategy
 from app.themes.rating_image.default.assets import HeaderImg, TeamRed, TeamBlue
@@ -20,7 +22,12 @@ from app.themes.rating_image.default.img_process import rating_to_wn8_hex, score
 
 
 class DefaultTheme(ThemeStrategy):
-    async def process_data(self, *args: Union[MatchResponse, str]) -> bytes:
+    async def prepare(self, *args: Union[MatchResponse, str]) -> dict:
+        match_info = args[0]
+        avatars = await asyncio.gather(*[get_user_avatar_image(user.id, user.avatar_url) for user in match_info.users])
+        return {"avatars": {user.id: avatar for user, avatar in zip(match_info.users, avatars)}}
+
+    async def process_data(self, *args: Union[MatchResponse, str], resources: dict) -> bytes:
         match_info = args[0]
         algorithm = args[1]
 
@@ -64,7 +71,7 @@ class DefaultTheme(ThemeStrategy):
                        (31, 41, 46, 255))
 
         draw = ImageDraw.Draw(im)
-        im.alpha_composite(Image.open(HeaderImg).convert("RGBA"), (0, 0))
+        im.alpha_composite(asset_store.get(HeaderImg), (0, 0))
 
         if team_type == TeamType.TEAM_VS:
             match_title = match_name.group(1)
@@ -108,10 +115,10 @@ class DefaultTheme(ThemeStrategy):
                 continue
             if player_stats.player_team == "red":
                 fill = '#d32f2e'
-                background = Image.open(TeamRed).convert("RGBA")
+                background = asset_store.get(TeamRed)
             else:
                 fill = '#00a0e8'
-                background = Image.open(TeamBlue).convert("RGBA")
+                background = asset_store.get(TeamBlue)
             rating_color = rating_to_wn8_hex(rating, player_stats.win_rate)
             draw_rounded_rectangle(draw, ((140, 170 * i + 280), (336, 170 * i + 390)), 20, fill=fill)
             draw_rounded_rectangle(draw, ((736, 170 * i + 280), (966, 170 * i + 389)), 20, fill=rating_color[1])
@@ -119,8 +126,7 @@ class DefaultTheme(ThemeStrategy):
             background = draw_fillet(background, 20)
             im.paste(background, (160, 170 * i + 280), background)
 
-            avatar = await get_user_avatar(user.id, user.avatar_url)
-            avatar = Image.open(BytesIO(avatar)).convert("RGBA")
+            avatar = resources["avatars"][user.id]
             avatar = crop_image(avatar, 176, 110)
             avatar = draw_fillet(avatar, 20)
             im.paste(avatar, (160, 170 * i + 280), avatar)
@@ -4,49 +4,55 @@ from typing import Union
 from PIL import Image, ImageDraw, ImageSequence
 from ossapi.models import DifficultyAttributes, User, Score, NonLegacyMod
 
+from app.draw.asset_store import asset_store
 from app.draw.flags import get_region_flag
 from app.osu_utils.beatmap import calculate_circle_size, calculate_hp, calculate_bpm, calculate_length
 from app.osu_utils.pp import PPCalculator
-from app.osu_utils.user import get_user_avatar
+from app.osu_utils.user import get_user_avatar_image
 from app.themes.score_image.default.assets import get_layout_image, get_mod_image, get_rank_image, SupporterBadge
 from app.draw.fonts import Harmony_Sans_Bold_20, Harmony_Sans_Bold_25, Harmony_Sans_Bold_30, \
     Harmony_Sans_Bold_75, VENERA_75, EXTRA_30
 from app.draw.utils import draw_fillet
-from app.themes.score_image.default.img_process import preprocess_bg, draw_stars_diff, draw_acc
+from app.database.image_cache import derived_image_cache
+from app.themes.score_image.default.img_process import preprocess_bg, draw_stars_diff, draw_acc, BG_OPS
 from app.themes.score_image.default.assets import IconLs
 from app.themes.theme_interface import ThemeStrategy
 
 
 class DefaultTheme(ThemeStrategy):
-    async def process_data(self, *args: Union[Score, User, PPCalculator, bytes, DifficultyAttributes]) -> bytes:
+    async def prepare(self, *args: Union[Score, User, PPCalculator, Image.Image, DifficultyAttributes]) -> dict:
+        user_info = args[1]
+        return {"avatar": await get_user_avatar_image(user_info.id, user_info.avatar_url)}
+
+    async def process_data(self, *args: Union[Score, User, PPCalculator, Image.Image, DifficultyAttributes],
+                           resources: dict) -> bytes:
         # 初始化参数
         present_play_record = args[0]
         user_info = args[1]
         pp_calculate = args[2]
-        map_bg = Image.open(BytesIO(args[3]))
+        map_bg = args[3]
         difficulty_attributes = args[4].attributes
         # 绘制图像方法
         im = Image.new("RGBA", (1500, 720))
         draw = ImageDraw.Draw(im)
-        map_bg = preprocess_bg(map_bg)
+        map_bg = await derived_image_cache.get(map_bg, "score_image/default", BG_OPS, preprocess_bg)
         im.alpha_composite(map_bg, (0, 0))
         # 绘制layout
         mode_image_path = get_layout_image(present_play_record.ruleset_id)
-        mode_image = Image.open(mode_image_path).convert("RGBA")
+        mode_image = asset_store.get(mode_image_path)
         im.alpha_composite(mode_image, (0, 0))
         # 绘制模式图标
         draw.text((75, 75), IconLs[present_play_record.ruleset_id], font=EXTRA_30, anchor="lt")
         # 难度星星
-        stars_bg = draw_stars_diff(pp_calculate.pp_info().difficulty.stars)
-        stars_img = stars_bg.resize((85, 37))
+        stars_img = draw_stars_diff(pp_calculate.difficulty.stars, (85, 37))
         im.alpha_composite(stars_img, (122, 72))
-        if pp_calculate.pp_info().difficulty.stars < 6.5:
+        if pp_calculate.difficulty.stars < 6.5:
             color = (0, 0, 0, 255)
         else:
             color = (255, 217, 102, 255)
         # 星级
         draw.text((128, 90),
-                  f"★{pp_calculate.pp_info().difficulty.stars:.2f}",
+                  f"★{pp_calculate.difficulty.stars:.2f}",
                   font=Harmony_Sans_Bold_20,
                   anchor="lm",
                   fill=color
@@ -56,7 +62,7 @@ class DefaultTheme(ThemeStrategy):
             for i, mod in enumerate(present_play_record.mods):
                 mod_img_path = get_mod_image(mod.acronym)
                 try:
-                    mod_img = Image.open(mod_img_path).convert("RGBA")
+                    mod_img = asset_store.get(mod_img_path)
                     im.alpha_composite(mod_img, (500 + 50 * i, 160))
                 except FileNotFoundError:
                     pass
@@ -70,27 +76,27 @@ class DefaultTheme(ThemeStrategy):
         for rank_num, rank in enumerate(ranking):
             rank_img = get_rank_image(rank)
             if rank_ok:
-                rank_b = Image.open(rank_img).convert("RGBA").resize((48, 24))
+                rank_b = asset_store.get(rank_img, (48, 24))
                 rank_new = Image.new("RGBA", rank_b.size, (0, 0, 0, 0))
                 rank_bg = Image.blend(rank_new, rank_b, 0.5)
             elif rank != present_play_record.rank.name:
-                rank_b = Image.open(rank_img).convert("RGBA").resize((48, 24))
+                rank_b = asset_store.get(rank_img, (48, 24))
                 rank_new = Image.new("RGBA", rank_b.size, (0, 0, 0, 0))
                 rank_bg = Image.blend(rank_new, rank_b, 0.2)
             else:
-                rank_bg = Image.open(rank_img).convert("RGBA").resize((48, 24))
+                rank_bg = asset_store.get(rank_img, (48, 24))
                 rank_ok = True
             im.alpha_composite(rank_bg, (75, 163 + 39 * rank_num))
         # 绘制acc
         im = draw_acc(im, present_play_record)
         # 绘制地区
         region_flag = get_region_flag(user_info.country_code)
-        region_img = Image.open(region_flag).convert("RGBA").resize((66, 45))
+        region_img = asset_store.get(region_flag, (66, 45))
         im.alpha_composite(region_img, (250, 577))
         # supporter图标
         if user_info.is_supporter:
-            supporter_img = Image.open(SupporterBadge).convert("RGBA")
-            im.alpha_composite(supporter_img.resize((40, 40)), (250, 640))
+            supporter_img = asset_store.get(SupporterBadge, (40, 40))
+            im.alpha_composite(supporter_img, (250, 640))
 
         # cs, ar, od, hp
         if present_play_record.ruleset_id in {0, 4, 8}:
@@ -126,7 +132,7 @@ class DefaultTheme(ThemeStrategy):
                     (1470, 310 + 35 * num), f"{i:.1f}", font=Harmony_Sans_Bold_20, anchor="mm"
                 )
         # star_rating
-        star_rating = pp_calculate.pp_info().difficulty.stars
+        star_rating = pp_calculate.difficulty.stars
         color = (255, 204, 34, 255)
         diff_len = max(int(250 * star_rating / 10) if star_rating <= 10 else 250, 0)
         diff_len = Image.new('RGBA', (diff_len, 8), color)
@@ -156,15 +162,15 @@ class DefaultTheme(ThemeStrategy):
         # 曲名
         draw.text(
             (75, 38),
-            f"{present_play_record.beatmap.beatmapset().title} |"
-            f" by {present_play_record.beatmap.beatmapset().artist_unicode}",
+            f"{present_play_record.beatmapset.title} |"
+            f" by {present_play_record.beatmapset.artist_unicode}",
             font=Harmony_Sans_Bold_30,
             anchor="lm",
         )
         # 谱面版本，mapper
         draw.text(
             (225, 90),
-            f"{present_play_record.beatmap.version} | 谱师: {present_play_record.beatmap.beatmapset().creator}",
+            f"{present_play_record.beatmap.version} | 谱师: {present_play_record.beatmapset.creator}",
             font=Harmony_Sans_Bold_20,
             anchor="lm",
         )
@@ -195,15 +201,15 @@ class DefaultTheme(ThemeStrategy):
         if present_play_record.ruleset_id in {0, 4, 8}:
             draw.text((720, 550), f"{pp_calculate.if_pp_ss_pp_info()[1]:.0f}", font=Harmony_Sans_Bold_30, anchor="mm")
             draw.text((840, 550), f"{pp_calculate.if_pp_ss_pp_info()[0]:.0f}", font=Harmony_Sans_Bold_30, anchor="mm")
-            draw.text((960, 550), f"{pp_calculate.pp_info().pp:.0f}", font=Harmony_Sans_Bold_30, anchor="mm")
+            draw.text((960, 550), f"{pp_calculate.performance.pp:.0f}", font=Harmony_Sans_Bold_30, anchor="mm")
             draw.text(
-                (720, 645), f"{pp_calculate.pp_info().pp_aim:.0f}", font=Harmony_Sans_Bold_30, anchor="mm"
+                (720, 645), f"{pp_calculate.performance.pp_aim:.0f}", font=Harmony_Sans_Bold_30, anchor="mm"
             )
             draw.text(
-                (840, 645), f"{pp_calculate.pp_info().pp_speed:.0f}", font=Harmony_Sans_Bold_30, anchor="mm"
+                (840, 645), f"{pp_calculate.performance.pp_speed:.0f}", font=Harmony_Sans_Bold_30, anchor="mm"
             )
             draw.text(
-                (960, 645), f"{pp_calculate.pp_info().pp_accuracy:.0f}", font=Harmony_Sans_Bold_30, anchor="mm"
+                (960, 645), f"{pp_calculate.performance.pp_accuracy:.0f}", font=Harmony_Sans_Bold_30, anchor="mm"
             )
             draw.text(
                 (1157, 550),
@@ -253,7 +259,7 @@ class DefaultTheme(ThemeStrategy):
             )
             draw.text(
                 (1420, 550),
-                f"{pp_calculate.pp_info().pp:.0f}/{pp_calculate.if_pp_ss_pp_info()[1]:.0f}",
+                f"{pp_calculate.performance.pp:.0f}/{pp_calculate.if_pp_ss_pp_info()[1]:.0f}",
                 font=Harmony_Sans_Bold_30,
                 anchor="mm"
             )
@@ -290,7 +296,7 @@ class DefaultTheme(ThemeStrategy):
             )
             draw.text(
                 (1411, 550),
-                f"{pp_calculate.pp_info().pp:.0f}/{pp_calculate.if_pp_ss_pp_info()[1]:.0f}",
+                f"{pp_calculate.performance.pp:.0f}/{pp_calculate.if_pp_ss_pp_info()[1]:.0f}",
                 font=Harmony_Sans_Bold_30,
                 anchor="mm"
             )
@@ -338,7 +344,7 @@ class DefaultTheme(ThemeStrategy):
             )
             draw.text(
                 (1395, 550),
-                f"{pp_calculate.pp_info().pp:.0f}/{pp_calculate.if_pp_ss_pp_info()[1]:.0f}",
+                f"{pp_calculate.performance.pp:.0f}/{pp_calculate.if_pp_ss_pp_info()[1]:.0f}",
                 font=Harmony_Sans_Bold_30,
                 anchor="mm"
             )
@@ -379,8 +385,7 @@ class DefaultTheme(ThemeStrategy):
                 anchor="mm",
             )
 
-        user_icon = await get_user_avatar(user_info.id, user_info.avatar_url)
-        user_icon = Image.open(BytesIO(user_icon)).convert("RGBA")
+        user_icon = resources["avatar"]
         gif_frames = []
         if not getattr(user_icon, "is_animated", False):
             icon_bg = user_icon.convert("RGBA").resize((170, 170))
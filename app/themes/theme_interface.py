@@ -1,3 +1,12 @@
 class ThemeStrategy:
+    async def prepare(self, *args) -> dict:
+        """
+        在主进程中获取绘制需要的头像、背景图、API 数据等, 结果以 resources 参数传给 process_data;
+        process_data 可能在绘图子进程中执行, 其中只做本地的图片处理
+        :param args: 与 process_data 相同的参数
+        :return: 可以被 dumps_model 序列化的资源
+        """
+        return {}
+
     async def process_data(self, *args, **kwargs):
         pass
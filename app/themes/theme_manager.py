@@ -1,8 +1,19 @@
 # app/themes/theme_manager.py
+import importlib
 import importlib.util
+import sys
+import threading
+import time
 from pathlib import Path
+
+from loguru import logger
+
+from app.config.settings import THEME_HOT_RELOAD
 from .theme_interface import ThemeStrategy
 
+# 热重载时两次检查文件修改时间的最小间隔（秒）
+_RELOAD_CHECK_INTERVAL = 1.0
+
 
 def load_theme_strategy(theme_path: Path) -> ThemeStrategy:
     spec = importlib.util.spec_from_file_location("theme_strategy", theme_path)
@@ -22,3 +33,84 @@ def discover_and_load_themes(feature_name: str) -> dict[str, ThemeStrategy]:
             themes[theme.name] = theme_strategy
 
     return themes
+
+
+class ThemeRegistry:
+    """
+    主题注册表, 每个功能的主题只加载一次
+
+    开启 hot_reload 后, 主题目录下的 .py 文件被修改时会重新加载该功能的全部主题,
+    主题引用的 img_process 等模块也会一并 reload, 仅用于主题开发
+    """
+
+    def __init__(self, base_path: Path, hot_reload: bool = False):
+        self._base_path = base_path
+        self._hot_reload = hot_reload
+        self._lock = threading.Lock()
+        self._themes: dict[str, dict[str, ThemeStrategy]] = {}
+        self._mtimes: dict[str, dict[Path, float]] = {}
+        self._checked_at: dict[str, float] = {}
+
+    def _scan(self, feature_name: str) -> dict[Path, float]:
+        return {path: path.stat().st_mtime for path in (self._base_path / feature_name).rglob("*.py")}
+
+    def _reload_modules(self, changed: set[Path]):
+        for module in list(sys.modules.values()):
+            module_file = getattr(module, "__file__", None)
+            if module_file and Path(module_file) in changed:
+                importlib.reload(module)
+
+    def _load(self, feature_name: str, changed: set[Path] = frozenset()) -> dict[str, ThemeStrategy]:
+        mtimes = self._scan(feature_name)
+        if changed:
+            self._reload_modules(changed)
+        themes = discover_and_load_themes(feature_name)
+        self._themes[feature_name] = themes
+        self._mtimes[feature_name] = mtimes
+        self._checked_at[feature_name] = time.monotonic()
+        return themes
+
+    def _changed_files(self, feature_name: str) -> set[Path]:
+        now = time.monotonic()
+        if now - self._checked_at.get(feature_name, 0) < _RELOAD_CHECK_INTERVAL:
+            return set()
+        self._checked_at[feature_name] = now
+        old, new = self._mtimes.get(feature_name, {}), self._scan(feature_name)
+        return {path for path, mtime in new.items() if old.get(path) != mtime}
+
+    def get_themes(self, feature_name: str) -> dict[str, ThemeStrategy]:
+        """
+        获取功能的全部主题
+
+        :param feature_name: 主题目录名, 如 score_image
+        :return: 以主题名为键的主题实例
+        """
+        with self._lock:
+            themes = self._themes.get(feature_name)
+            if themes is None:
+                return self._load(feature_name)
+            if self._hot_reload:
+                changed = self._changed_files(feature_name)
+                if changed:
+                    logger.info(f"Reloading {feature_name} themes: {', '.join(path.name for path in changed)}")
+                    try:
+                        return self._load(feature_name, changed)
+                    except Exception as e:
+                        # 修改到一半的文件可能无法加载, 继续使用旧版本
+                        logger.error(f"Failed to reload {feature_name} themes: {e}")
+            return themes
+
+    def load_all(self):
+        """
+        加载全部主题, 在应用启动时调用
+        """
+        for feature in self._base_path.iterdir():
+            if feature.is_dir() and not feature.name.startswith("__"):
+                try:
+                    self.get_themes(feature.name)
+                except Exception as e:
+                    # 与按需加载时一致, 单个主题加载失败只影响对应的功能
+                    logger.error(f"Failed to load {feature.name} themes: {e}")
+
+
+theme_registry = ThemeRegistry(Path(__file__).parent, THEME_HOT_RELOAD)
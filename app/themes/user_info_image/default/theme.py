@@ -1,3 +1,4 @@
+import asyncio
 from datetime import timedelta, datetime
 from io import BytesIO
 from typing import Union, Optional, List
@@ -5,18 +6,30 @@ from typing import Union, Optional, List
 from PIL import Image, ImageDraw, ImageSequence
 from ossapi.models import Score, User
 
+from app.draw.asset_store import asset_store
 from app.draw.flags import get_region_flag
 from app.draw.fonts import Harmony_Sans_Bold_40, Harmony_Sans_Bold_50, Harmony_Sans_Bold_30, Harmony_Sans_Bold_25, \
     Harmony_Sans_Bold_20, Harmony_Sans_Bold_35
 from app.draw.utils import draw_fillet
-from app.osu_utils.user import get_user_badge, get_user_avatar, get_info_bg
+from app.osu_utils.user import get_user_badge_image, get_user_avatar_image, get_info_bg
 from app.themes.theme_interface import ThemeStrategy
 from app.themes.user_info_image.default.assets import get_layout_image, SupporterBadge, get_exp_bar_image
 from app.user.models import UserOsuInfoHistory
 
 
 class DefaultTheme(ThemeStrategy):
-    async def process_data(self, *args: Union[User, UserOsuInfoHistory | None, str, List[Score]]) -> bytes:
+    async def prepare(self, *args: Union[User, UserOsuInfoHistory | None, str, List[Score]]) -> dict:
+        user_info = args[0]
+        badge_urls = list({badge.image_2x_url for badge in user_info.badges})
+        background, avatar, badges = await asyncio.gather(
+            get_info_bg(user_info.id),
+            get_user_avatar_image(user_info.id, user_info.avatar_url),
+            asyncio.gather(*[get_user_badge_image(url) for url in badge_urls]),
+        )
+        return {"background": background, "avatar": avatar, "badges": dict(zip(badge_urls, badges))}
+
+    async def process_data(self, *args: Union[User, UserOsuInfoHistory | None, str, List[Score]],
+                           resources: dict) -> bytes:
         # 初始化参数
         user_info = args[0]
         history_info = args[1]
@@ -45,7 +58,7 @@ class DefaultTheme(ThemeStrategy):
         im = Image.new("RGBA", (1000, 1350))
         draw = ImageDraw.Draw(im)
         # 获取背景
-        user_bg = await get_info_bg(user_info.id)
+        user_bg = resources["background"]
         if user_bg:
             user_bg = Image.open(BytesIO(user_bg))
             bg = user_bg.convert("RGBA")
@@ -61,13 +74,13 @@ class DefaultTheme(ThemeStrategy):
             bg = bg.crop((x, y, x + width, y + height)).resize((1000, 1350))
             im.alpha_composite(bg, (0, 0))
         # 底图
-        layout = Image.open(get_layout_image())
+        layout = asset_store.get(get_layout_image())
         im.alpha_composite(layout)
         # badges
         if len(user_info.badges) > 0:
             for i, badge in enumerate(user_info.badges):
-                badge_img = await get_user_badge(user_info.id, badge.image_2x_url, badge.description)
-                badge_img = Image.open(badge_img).convert("RGBA").resize((86, 40))
+                badge_img = resources["badges"][badge.image_2x_url]
+                badge_img = badge_img.resize((86, 40))
                 if len(user_info.badges) <= 9:
                     length = 50 + 100 * i
                     height = 510
@@ -80,21 +93,20 @@ class DefaultTheme(ThemeStrategy):
                 im.alpha_composite(badge_img, (length, height))
         # flags
         region_flag = get_region_flag(user_info.country_code)
-        region_img = Image.open(region_flag).convert("RGBA").resize((80, 54))
+        region_img = asset_store.get(region_flag, (80, 54))
         im.alpha_composite(region_img, (400, 394))
         # supporter
         if user_info.is_supporter:
-            supporter_img = Image.open(SupporterBadge).convert("RGBA").resize((60, 60))
+            supporter_img = asset_store.get(SupporterBadge, (60, 60))
             im.alpha_composite(supporter_img, (50, 394))
         # Exp bar
         if user_info.statistics.level.progress != 0:
             left, center, right = get_exp_bar_image()
-            left = Image.open(left).convert("RGBA")
-            center = Image.open(center).convert("RGBA")
-            right = Image.open(right).convert("RGBA")
+            left = asset_store.get(left)
+            right = asset_store.get(right)
             exp_width = user_info.statistics.level.progress * 7 - 3
             im.alpha_composite(left, (50, 646))
-            im.alpha_composite(center.resize((exp_width, 10)), (54, 646))
+            im.alpha_composite(asset_store.get(center, (exp_width, 10)), (54, 646))
             im.alpha_composite(right, (int(54 + exp_width), 646))
         # 模式
         draw.text((930, 50), f"{game_mode}", font=Harmony_Sans_Bold_40, anchor="rm")
@@ -193,9 +205,9 @@ class DefaultTheme(ThemeStrategy):
             draw.text((380, 1305), current_time, font=Harmony_Sans_Bold_25, anchor="la")
         # 头像
         gif_frames = []
-        user_icon = await get_user_avatar(user_info.id, user_info.avatar_url)
+        user_icon = resources["avatar"]
         if not getattr(user_icon, "is_animated", False):
-            icon_bg = Image.open(BytesIO(user_icon)).convert("RGBA").resize((300, 300))
+            icon_bg = user_icon.resize((300, 300))
             icon_img = draw_fillet(icon_bg, 25)
             im.alpha_composite(icon_img, (50, 148))
             byt = BytesIO()
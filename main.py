@@ -15,6 +15,17 @@ from app.api.api_v1.endpoints.score import score_router
 from app.api.api_v1.endpoints.user_info import info_router
 from app.api.api_v1.endpoints.task import task_router
 from app.api.api_v1.endpoints.multiplayer import multiplayer_router
+from app.database.cache import redis_cache
+from app.database.disk_cache import disk_cache
+from app.network.network import close_http_clients
+from app.network.osu_api import osu_api
+from app.network.public_token import public_token
+from app.osu_utils.file import run_file_io, shutdown_file_io
+from app.draw.asset_store import asset_store
+from app.draw.render import render_pool
+from app.osu_utils.pp_pool import pp_pool
+from app.osu_utils.prefetch import prefetcher
+from app.themes.theme_manager import theme_registry
 
 app = FastAPI(title="HitCircle API", version="1.3.0")
 logger.add("logs/{time:YYYY-MM-DD}.log", rotation="1 day", retention="7 days", level="DEBUG")
@@ -62,6 +73,33 @@ app.include_router(task_router)
 app.state.limiter = limiter
 
 
+@app.on_event("startup")
+async def startup():
+    theme_registry.load_all()
+    pp_pool.start()
+    render_pool.start()
+    # 启用绘图进程池时由子进程各自预加载, 主进程不参与绘制
+    if ASSET_PRELOAD and not render_pool.enabled:
+        await run_file_io(asset_store.preload_themes)
+    if not await redis_cache.connect():
+        logger.warning("Redis is not available, falling back to in-process cache")
+    public_token.start_renewal()
+    prefetcher.start_schedule(PREFETCH_INTERVAL)
+
+
+@app.on_event("shutdown")
+async def shutdown():
+    await prefetcher.stop()
+    await public_token.stop_renewal()
+    await close_http_clients()
+    osu_api.shutdown()
+    pp_pool.shutdown()
+    render_pool.shutdown()
+    await redis_cache.close()
+    disk_cache.close()
+    shutdown_file_io()
+
+
 @app.exception_handler(RateLimitExceeded)
 async def rate_limit_exceeded_handler(request, exc):
     return PlainTextResponse("Too many requests", status_code=status.HTTP_429_TOO_MANY_REQUESTS)